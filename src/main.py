@@ -6,13 +6,10 @@ import argparse
 import datetime
 import signal
 import sys
-import time
+import threading
 from typing import Optional
 
 from rpicam_scraper.config import config
-from rpicam_scraper.video_scraper import VideoScraper
-from rpicam_scraper.video_processor import VideoProcessor
-from rpicam_scraper.scheduler import RPiCamScheduler
 
 
 def setup_argument_parser() -> argparse.ArgumentParser:
@@ -33,8 +30,9 @@ Examples:
     parser.add_argument(
         "--mode",
         choices=["scrape", "daily", "scheduler"],
-        default="scheduler" if config.ENABLE_SCHEDULER else "scrape",
-        help="Operation mode: 'scrape' for one-time scrape, 'daily' for one-time processing, 'scheduler' for automatic scheduling"
+        default=None,
+        help="Operation mode: 'scrape' for one-time scrape, 'daily' for one-time processing, 'scheduler' for automatic scheduling "
+             "(default: 'scheduler' if RPICAM_ENABLE_SCHEDULER is true, otherwise 'scrape')"
     )
     
     parser.add_argument(
@@ -70,6 +68,9 @@ def main():
     parser = setup_argument_parser()
     args = parser.parse_args()
     
+    if args.mode is None:
+        args.mode = "scheduler" if config.ENABLE_SCHEDULER else "scrape"
+    
     try:
         # Validate configuration
         config.validate()
@@ -84,12 +85,16 @@ def main():
     
     try:
         if args.mode == "scrape":
+            from rpicam_scraper.video_scraper import VideoScraper
+            
             print("Starting video scraping and download...")
             scraper = VideoScraper()
             scraper.fetch_and_clean()
             print("Video scraping completed.")
             
         elif args.mode == "daily":
+            from rpicam_scraper.video_processor import VideoProcessor
+            
             print("Starting daily video processing...")
             if args.date:
                 print(f"Processing videos for date: {args.date}")
@@ -106,17 +111,25 @@ def main():
                 sys.exit(1)
         
         elif args.mode == "scheduler":
+            from rpicam_scraper.scheduler import RPiCamScheduler
+            
             print("Starting scheduler...")
+            shutdown = threading.Event()
+            
+            def shutdown_handler(signum, frame):
+                print(f"\nReceived signal {signum}. Shutting down gracefully...")
+                shutdown.set()
+            
+            signal.signal(signal.SIGINT, shutdown_handler)
+            signal.signal(signal.SIGTERM, shutdown_handler)
+            
             scheduler = RPiCamScheduler()
             scheduler.start()
             
-            try:
-                # Keep the main thread alive
-                while True:
-                    time.sleep(1)
-            except KeyboardInterrupt:
-                print("\nStopping scheduler...")
-                scheduler.stop()
+            # Block the main thread until a shutdown signal arrives
+            shutdown.wait()
+            print("Stopping scheduler...")
+            scheduler.stop()
                 
     except KeyboardInterrupt:
         print("\nOperation cancelled by user.")
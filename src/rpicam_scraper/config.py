@@ -4,53 +4,79 @@ All configuration values are loaded from environment variables.
 """
 
 import os
+from functools import cached_property
 from typing import List
 
 
 class Config:
     """Configuration class that loads all settings from environment variables."""
     
+    # Environment variables read by Config, settings outside this list are never seen
+    _ENV_KEYS = (
+        "RPICAM_BASE_URL",
+        "YOUTUBE_CLIENT_SECRETS",
+        "YOUTUBE_TOKEN_PATH",
+        "YOUTUBE_UPLOAD_TITLE_PREFIX",
+        "YOUTUBE_UPLOAD_DESCRIPTION",
+        "YOUTUBE_UPLOAD_TAGS",
+        "YOUTUBE_UPLOAD_CATEGORY",
+        "YOUTUBE_PRIVACY_STATUS",
+        "RPICAM_DATA_DIR",
+        "RPICAM_MAX_RETRIES",
+        "RPICAM_REQUEST_TIMEOUT",
+        "RPICAM_DOWNLOAD_TIMEOUT",
+        "RPICAM_DOWNLOAD_CHUNK_SIZE",
+        "RPICAM_DOWNLOAD_CONCURRENCY",
+        "RPICAM_ENABLE_SCHEDULER",
+        "RPICAM_SCRAPE_INTERVAL_MINUTES",
+        "RPICAM_DAILY_PROCESS_TIME",
+    )
+    
     def __init__(self):
         """Initialize configuration by loading from environment variables."""
+        # Read a single snapshot of only the variables Config uses
+        env = {key: os.environ[key] for key in self._ENV_KEYS if key in os.environ}
+        
         # Camera server configuration
-        self.BASE_URL: str = os.environ.get("RPICAM_BASE_URL", "")
+        self.BASE_URL: str = env.get("RPICAM_BASE_URL", "")
         
         # YouTube API configuration
-        self.YOUTUBE_CLIENT_SECRETS: str = os.environ.get("YOUTUBE_CLIENT_SECRETS", "client_secrets.json")
-        self.YOUTUBE_TOKEN_PATH: str = os.environ.get("YOUTUBE_TOKEN_PATH", "token.pickle")
-        self.YOUTUBE_UPLOAD_TITLE_PREFIX: str = os.environ.get("YOUTUBE_UPLOAD_TITLE_PREFIX", "RPiCam")
-        self.YOUTUBE_UPLOAD_DESCRIPTION: str = os.environ.get("YOUTUBE_UPLOAD_DESCRIPTION", "Uploaded by RPI-Cam-Web-Interface-Scraper")
-        self.YOUTUBE_UPLOAD_TAGS: str = os.environ.get("YOUTUBE_UPLOAD_TAGS", "RPiCam,AutoUpload")
-        self.YOUTUBE_UPLOAD_CATEGORY: str = os.environ.get("YOUTUBE_UPLOAD_CATEGORY", "22")  # People & Blogs
-        self.YOUTUBE_PRIVACY_STATUS: str = os.environ.get("YOUTUBE_PRIVACY_STATUS", "unlisted")
+        self.YOUTUBE_CLIENT_SECRETS: str = env.get("YOUTUBE_CLIENT_SECRETS", "client_secrets.json")
+        self.YOUTUBE_TOKEN_PATH: str = env.get("YOUTUBE_TOKEN_PATH", "token.pickle")
+        self.YOUTUBE_UPLOAD_TITLE_PREFIX: str = env.get("YOUTUBE_UPLOAD_TITLE_PREFIX", "RPiCam")
+        self.YOUTUBE_UPLOAD_DESCRIPTION: str = env.get("YOUTUBE_UPLOAD_DESCRIPTION", "Uploaded by RPI-Cam-Web-Interface-Scraper")
+        self.YOUTUBE_UPLOAD_TAGS: str = env.get("YOUTUBE_UPLOAD_TAGS", "RPiCam,AutoUpload")
+        self.YOUTUBE_UPLOAD_CATEGORY: str = env.get("YOUTUBE_UPLOAD_CATEGORY", "22")  # People & Blogs
+        self.YOUTUBE_PRIVACY_STATUS: str = env.get("YOUTUBE_PRIVACY_STATUS", "unlisted")
         
         # File storage configuration
-        self.DATA_DIR: str = os.environ.get("RPICAM_DATA_DIR", "/data/videos")
+        self.DATA_DIR: str = env.get("RPICAM_DATA_DIR", "/data/videos")
         
         # Processing configuration
-        self.MAX_RETRIES: int = int(os.environ.get("RPICAM_MAX_RETRIES", "5"))
-        self.REQUEST_TIMEOUT: int = int(os.environ.get("RPICAM_REQUEST_TIMEOUT", "30"))
-        self.DOWNLOAD_TIMEOUT: int = int(os.environ.get("RPICAM_DOWNLOAD_TIMEOUT", "60"))
-        self.DOWNLOAD_CHUNK_SIZE: int = int(os.environ.get("RPICAM_DOWNLOAD_CHUNK_SIZE", "8192"))
+        self.MAX_RETRIES: int = int(env.get("RPICAM_MAX_RETRIES", "5"))
+        self.REQUEST_TIMEOUT: int = int(env.get("RPICAM_REQUEST_TIMEOUT", "30"))
+        self.DOWNLOAD_TIMEOUT: int = int(env.get("RPICAM_DOWNLOAD_TIMEOUT", "60"))
+        self.DOWNLOAD_CHUNK_SIZE: int = int(env.get("RPICAM_DOWNLOAD_CHUNK_SIZE", "1048576"))
+        self.DOWNLOAD_CONCURRENCY: int = int(env.get("RPICAM_DOWNLOAD_CONCURRENCY", "4"))
         
         # Scheduling configuration
-        self.ENABLE_SCHEDULER: bool = os.environ.get("RPICAM_ENABLE_SCHEDULER", "true").lower() == "true"
-        self.SCRAPE_INTERVAL_MINUTES: int = int(os.environ.get("RPICAM_SCRAPE_INTERVAL_MINUTES", "15"))
-        self.DAILY_PROCESS_TIME: str = os.environ.get("RPICAM_DAILY_PROCESS_TIME", "23:59")  # HH:MM format
+        self.ENABLE_SCHEDULER: bool = env.get("RPICAM_ENABLE_SCHEDULER", "true").lower() == "true"
+        self.SCRAPE_INTERVAL_MINUTES: int = int(env.get("RPICAM_SCRAPE_INTERVAL_MINUTES", "15"))
+        self.DAILY_PROCESS_TIME: str = env.get("RPICAM_DAILY_PROCESS_TIME", "23:59")  # HH:MM format
         
         # YouTube API scopes
         self.YOUTUBE_SCOPES = ["https://www.googleapis.com/auth/youtube.upload"]
     
-    @property
+    @cached_property
     def preview_url(self) -> str:
-        """Get the full preview URL."""
+        """Get the full preview URL (computed on first access)."""
         if not self.BASE_URL:
             raise ValueError("RPICAM_BASE_URL environment variable is required")
         return f"{self.BASE_URL.rstrip('/')}/preview.php"
     
-    @property
+    @cached_property
     def youtube_tags_list(self) -> List[str]:
-        """Get YouTube tags as a list."""
+        """Get YouTube tags as a list (computed on first access)."""
         return [tag.strip() for tag in self.YOUTUBE_UPLOAD_TAGS.split(",") if tag.strip()]
     
     def validate(self) -> None:
@@ -65,5 +91,29 @@ class Config:
             raise ValueError(f"Missing required environment variables: {', '.join(missing_vars)}")
 
 
-# Global config instance
-config = Config()
+class _LazyConfig:
+    """Proxy that builds the global Config on first attribute access."""
+    
+    def __init__(self):
+        object.__setattr__(self, "_instance", None)
+    
+    def _get_instance(self) -> Config:
+        instance = object.__getattribute__(self, "_instance")
+        if instance is None:
+            instance = Config()
+            object.__setattr__(self, "_instance", instance)
+        return instance
+    
+    def __getattr__(self, name):
+        return getattr(self._get_instance(), name)
+    
+    def __setattr__(self, name, value):
+        setattr(self._get_instance(), name, value)
+    
+    def reset_cache(self) -> None:
+        """Drop the cached Config so the environment is read again on next access (for tests)."""
+        object.__setattr__(self, "_instance", None)
+
+
+# Global config instance (environment is parsed on first use)
+config = _LazyConfig()
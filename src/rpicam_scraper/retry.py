@@ -0,0 +1,72 @@
+"""
+Retry helpers with exponential backoff for operations that are not plain HTTP requests.
+"""
+
+import random
+import time
+from typing import Callable, Optional, TypeVar
+
+T = TypeVar("T")
+
+
+def backoff_delay(attempt: int, base_delay: float = 1.0, jitter: bool = True) -> float:
+    """
+    Get the exponential backoff delay after a failed attempt.
+    
+    Args:
+        attempt: Zero-based number of the attempt that failed
+        base_delay: Delay in seconds after the first failed attempt
+        jitter: Randomize the delay by +/-50% so concurrent retries spread out
+        
+    Returns:
+        float: Delay in seconds
+    """
+    delay = base_delay * 2 ** attempt
+    if jitter:
+        delay *= random.uniform(0.5, 1.5)
+    return delay
+
+
+def call_with_retry(
+    func: Callable[[], T],
+    max_attempts: int,
+    description: str,
+    base_delay: float = 1.0,
+    jitter: bool = True,
+    get_delay: Optional[Callable[[Exception], Optional[float]]] = None,
+    should_retry: Optional[Callable[[Exception], bool]] = None
+) -> T:
+    """
+    Call a function until it succeeds, sleeping with exponential backoff between attempts.
+    
+    Args:
+        func: Function to call, without arguments
+        max_attempts: Maximum number of attempts
+        description: Name of the operation used in log messages
+        base_delay: Delay in seconds after the first failed attempt
+        jitter: Randomize each delay by +/-50%
+        get_delay: Optional function returning a custom delay for an error, or None to use backoff
+        should_retry: Optional function returning False for errors that must not be retried
+        
+    Returns:
+        The return value of func
+        
+    Raises:
+        Exception: The error of the last attempt if all attempts fail, or the first
+            error that should not be retried
+    """
+    max_attempts = max(1, max_attempts)
+    
+    for attempt in range(max_attempts):
+        try:
+            return func()
+        except Exception as e:
+            print(f"{description} error (attempt {attempt+1}): {e}")
+            if attempt + 1 == max_attempts or (should_retry and not should_retry(e)):
+                raise
+            
+            delay = get_delay(e) if get_delay else None
+            if delay is None:
+                delay = backoff_delay(attempt, base_delay, jitter)
+            print(f"Retrying {description} in {delay:.1f} seconds...")
+            time.sleep(delay)
@@ -3,7 +3,6 @@ Scheduler module for automatic video scraping and processing.
 """
 
 import datetime
-import time
 import threading
 from typing import Optional
 
@@ -18,18 +17,27 @@ class RPiCamScheduler:
     def __init__(self):
         self.scraper = VideoScraper()
         self.processor = VideoProcessor()
-        self.running = False
         self.last_daily_process = None
+        # YouTube rate limits apply to the whole account, no upload is tried before this time
+        self.rate_limited_until: Optional[datetime.datetime] = None
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
         
-    def should_run_daily_process(self) -> bool:
-        """Check if it's time to run the daily process."""
-        now = datetime.datetime.now()
-        
-        # Parse the configured time (HH:MM format)
+        # Parse the configured time (HH:MM format) once
         try:
             hour, minute = map(int, config.DAILY_PROCESS_TIME.split(':'))
         except (ValueError, AttributeError):
             hour, minute = 23, 59  # Default to 23:59
+        self._target_hm = (hour, minute)
+        self._scrape_interval = datetime.timedelta(minutes=config.SCRAPE_INTERVAL_MINUTES)
+        
+        # Defer rate limited uploads to a later loop iteration instead of blocking scraping
+        self.processor.youtube_uploader.on_rate_limit = self.defer_upload
+        
+    def should_run_daily_process(self) -> bool:
+        """Check if it's time to run the daily process."""
+        now = datetime.datetime.now()
+        hour, minute = self._target_hm
         
         target_time = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
         
@@ -41,6 +49,27 @@ class RPiCamScheduler:
         
         return False
     
+    def defer_upload(self, delay: float) -> None:
+        """Postpone all uploads by delay seconds, e.g. after hitting a rate limit."""
+        self.rate_limited_until = datetime.datetime.now() + datetime.timedelta(seconds=delay)
+        print(f"[{datetime.datetime.now()}] Uploads deferred until {self.rate_limited_until}.")
+    
+    def is_rate_limited(self) -> bool:
+        """Check if uploads are currently deferred because of a rate limit."""
+        return self.rate_limited_until is not None and datetime.datetime.now() < self.rate_limited_until
+    
+    def should_run_pending_uploads(self) -> bool:
+        """Check if there are failed uploads to retry and uploads are allowed."""
+        return bool(self.processor.pending_uploads) and not self.is_rate_limited()
+    
+    def next_daily_process_time(self, now: datetime.datetime) -> datetime.datetime:
+        """Get the next configured daily processing time after now."""
+        hour, minute = self._target_hm
+        target_time = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
+        if target_time <= now:
+            target_time += datetime.timedelta(days=1)
+        return target_time
+    
     def run_scraping(self) -> None:
         """Run video scraping."""
         try:
@@ -52,17 +81,41 @@ class RPiCamScheduler:
     
     def run_daily_process(self) -> None:
         """Run daily video processing."""
+        now = datetime.datetime.now()
+        date_str = now.strftime("%Y-%m-%d")
         try:
-            print(f"[{datetime.datetime.now()}] Starting scheduled daily processing...")
-            success = self.processor.process_daily_videos()
+            print(f"[{now}] Starting scheduled daily processing...")
+            # Still combine today's videos during a rate limit, but leave the upload for later
+            upload = not self.is_rate_limited()
+            success = self.processor.process_daily_videos(date_str, upload=upload)
             if success:
                 print(f"[{datetime.datetime.now()}] Daily processing completed successfully.")
-                self.last_daily_process = datetime.datetime.now().date()
+                self.last_daily_process = now.date()
+            elif date_str in self.processor.pending_uploads:
+                # The videos are combined, only the upload of that date is retried later
+                print(f"[{datetime.datetime.now()}] Upload for {date_str} will be retried.")
+                self.last_daily_process = now.date()
             else:
                 print(f"[{datetime.datetime.now()}] Daily processing failed.")
         except Exception as e:
             print(f"[{datetime.datetime.now()}] Error during daily processing: {e}")
     
+    def run_pending_uploads(self) -> None:
+        """Retry the uploads of combined videos whose earlier upload failed, oldest first."""
+        for date_str in sorted(self.processor.pending_uploads):
+            # Leave the remaining dates for later once an upload hits the rate limit again
+            if self.is_rate_limited():
+                break
+            
+            try:
+                print(f"[{datetime.datetime.now()}] Retrying upload for {date_str}...")
+                if self.processor.retry_upload(date_str):
+                    print(f"[{datetime.datetime.now()}] Upload for {date_str} completed successfully.")
+                else:
+                    print(f"[{datetime.datetime.now()}] Upload for {date_str} failed.")
+            except Exception as e:
+                print(f"[{datetime.datetime.now()}] Error during upload retry: {e}")
+    
     def run_scheduler(self) -> None:
         """Main scheduler loop."""
         print(f"[{datetime.datetime.now()}] Scheduler started.")
@@ -70,13 +123,12 @@ class RPiCamScheduler:
         print(f"  - Daily processing time: {config.DAILY_PROCESS_TIME}")
         
         last_scrape = datetime.datetime.min
-        scrape_interval = datetime.timedelta(minutes=config.SCRAPE_INTERVAL_MINUTES)
         
-        while self.running:
+        while not self._stop_event.is_set():
             now = datetime.datetime.now()
             
             # Check if it's time for scraping
-            if now - last_scrape >= scrape_interval:
+            if now - last_scrape >= self._scrape_interval:
                 self.run_scraping()
                 last_scrape = now
             
@@ -84,22 +136,30 @@ class RPiCamScheduler:
             if self.should_run_daily_process():
                 self.run_daily_process()
             
-            # Sleep for 1 minute before checking again
-            time.sleep(60)
+            # Check if failed uploads can be retried
+            if self.should_run_pending_uploads():
+                self.run_pending_uploads()
+            
+            # Sleep until the next scrape, daily process or upload retry is due, or until stopped
+            now = datetime.datetime.now()
+            next_event = min(last_scrape + self._scrape_interval, self.next_daily_process_time(now))
+            if self.processor.pending_uploads and self.is_rate_limited():
+                next_event = min(next_event, self.rate_limited_until)
+            self._stop_event.wait(max(1.0, (next_event - now).total_seconds()))
         
         print(f"[{datetime.datetime.now()}] Scheduler stopped.")
     
-    def start(self) -> None:
+    def start(self) -> Optional[threading.Thread]:
         """Start the scheduler in a separate thread."""
-        if self.running:
+        if self._thread is not None and self._thread.is_alive():
             print("Scheduler is already running.")
-            return
+            return None
         
-        self.running = True
-        scheduler_thread = threading.Thread(target=self.run_scheduler, daemon=True)
-        scheduler_thread.start()
-        return scheduler_thread
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self.run_scheduler, daemon=True)
+        self._thread.start()
+        return self._thread
     
     def stop(self) -> None:
-        """Stop the scheduler."""
-        self.running = False
+        """Stop the scheduler, waking it up if it is sleeping."""
+        self._stop_event.set()
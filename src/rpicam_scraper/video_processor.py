@@ -5,18 +5,26 @@ Video processor module for concatenating and processing videos.
 import os
 import datetime
 import subprocess
-import time
-from typing import List, Optional
+from typing import Dict, List, Optional
 
 from .config import config
+from .retry import call_with_retry
 from .youtube_uploader import YouTubeUploader
 
+# Amount of ffmpeg stderr output reported when concatenation fails
+FFMPEG_STDERR_TAIL_BYTES = 4096
+
+# Suffix of the concatenated daily video, which is never an input clip itself
+COMBINED_SUFFIX = "_combined.mp4"
+
 
 class VideoProcessor:
     """Handles video concatenation and processing operations."""
     
     def __init__(self):
         self.youtube_uploader = YouTubeUploader()
+        # Clips of each date whose combined video still has to be uploaded
+        self.pending_uploads: Dict[str, List[str]] = {}
     
     def get_video_files(self, day_dir: str) -> List[str]:
         """
@@ -26,17 +34,44 @@ class VideoProcessor:
             day_dir: Directory to search for video files
             
         Returns:
-            list: Sorted list of MP4 filenames
+            list: Sorted list of MP4 filenames, without the combined daily video
         """
-        if not os.path.exists(day_dir):
+        try:
+            with os.scandir(day_dir) as entries:
+                files = [
+                    entry.name for entry in entries
+                    if entry.name.endswith('.mp4') and not entry.name.endswith(COMBINED_SUFFIX)
+                    and entry.is_file()
+                ]
+        except FileNotFoundError:
             return []
         
-        return sorted([f for f in os.listdir(day_dir) if f.endswith('.mp4')])
+        files.sort()
+        return files
+    
+    def build_ffmpeg_file_list(self, day_dir: str, files: List[str]) -> str:
+        """
+        Build the contents of a file list for the ffmpeg concat demuxer.
+        
+        Args:
+            day_dir: Directory containing the video files
+            files: List of video filenames
+            
+        Returns:
+            str: File list with one absolute path per line
+        """
+        # Use absolute paths with an explicit file: protocol, a list read from
+        # stdin would otherwise resolve its entries as pipe: URLs
+        abs_day_dir = os.path.abspath(day_dir)
+        return "".join(f"file 'file:{abs_day_dir}{os.sep}{file}'\n" for file in files)
     
     def create_ffmpeg_file_list(self, day_dir: str, files: List[str]) -> str:
         """
         Create a file list for ffmpeg concatenation.
         
+        concatenate_videos pipes the list to ffmpeg directly, this writes it
+        to disk for running ffmpeg by hand.
+        
         Args:
             day_dir: Directory containing the video files
             files: List of video filenames
@@ -45,13 +80,60 @@ class VideoProcessor:
             str: Path to the created file list
         """
         list_path = os.path.join(day_dir, 'files.txt')
+        content = self.build_ffmpeg_file_list(day_dir, files)
         with open(list_path, 'w') as f:
-            for file in files:
-                # Use absolute paths for ffmpeg
-                abs_path = os.path.abspath(os.path.join(day_dir, file))
-                f.write(f"file '{abs_path}'\n")
+            f.write(content)
         return list_path
     
+    def get_video_stream_info(self, file_path: str) -> Optional[str]:
+        """
+        Get the codec and resolution of the first video stream in a file.
+        
+        Args:
+            file_path: Path to the video file
+            
+        Returns:
+            str: ffprobe's "codec,width,height" line, or None if probing fails
+        """
+        cmd = [
+            'ffprobe', '-v', 'error', '-select_streams', 'v:0',
+            '-show_entries', 'stream=codec_name,width,height', '-of', 'csv=p=0', file_path
+        ]
+        
+        try:
+            result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, timeout=30)
+        except (OSError, subprocess.TimeoutExpired) as e:
+            print(f"ffprobe execution error: {e}")
+            return None
+        
+        if result.returncode != 0:
+            return None
+        
+        return result.stdout.decode(errors="replace").strip()
+    
+    def videos_are_compatible(self, day_dir: str, files: List[str]) -> bool:
+        """
+        Check whether videos can be joined with stream copy by comparing the first and last file.
+        
+        Args:
+            day_dir: Directory containing the video files
+            files: List of video filenames
+            
+        Returns:
+            bool: False if the streams are known to differ, True otherwise
+        """
+        if len(files) < 2:
+            return True
+        
+        first_info = self.get_video_stream_info(os.path.join(day_dir, files[0]))
+        last_info = self.get_video_stream_info(os.path.join(day_dir, files[-1]))
+        
+        # If probing failed, assume the files match and let ffmpeg decide
+        if first_info is None or last_info is None:
+            return True
+        
+        return first_info == last_info
+    
     def concatenate_videos(self, day_dir: str, files: List[str], output_path: str) -> bool:
         """
         Concatenate multiple video files using ffmpeg.
@@ -64,34 +146,56 @@ class VideoProcessor:
         Returns:
             bool: True if concatenation was successful, False otherwise
         """
-        list_path = self.create_ffmpeg_file_list(day_dir, files)
+        file_list = self.build_ffmpeg_file_list(day_dir, files).encode()
         
-        for attempt in range(config.MAX_RETRIES):
-            cmd = [
-                'ffmpeg', '-y', '-f', 'concat', '-safe', '0', '-i', list_path,
-                '-c', 'copy', output_path
-            ]
-            
-            print(f"Running ffmpeg to concatenate {len(files)} files... (attempt {attempt+1})")
-            
-            try:
-                result = subprocess.run(cmd, capture_output=True, text=True, timeout=300)
-                
-                if result.returncode == 0:
-                    print(f"Concatenated video saved to {output_path}")
-                    return True
-                else:
-                    print(f"ffmpeg error: {result.stderr}")
-                    
-            except subprocess.TimeoutExpired:
-                print("ffmpeg operation timed out")
-            except Exception as e:
-                print(f"ffmpeg execution error: {e}")
+        # Stream copy only works when all inputs share codec parameters,
+        # otherwise retrying cannot help and the video has to be re-encoded
+        if self.videos_are_compatible(day_dir, files):
+            codec_args = ['-c', 'copy']
+        else:
+            print("Video streams differ, re-encoding instead of stream copy")
+            codec_args = ['-c:v', 'libx264', '-preset', 'veryfast']
+        
+        # Only log errors so stderr stays small, read the file list from stdin instead of
+        # a temporary file, and regenerate timestamps to avoid the usual concat failures
+        # on jittery segments
+        cmd = [
+            'ffmpeg', '-y', '-loglevel', 'error', '-nostats', '-fflags', '+genpts', '-f', 'concat', '-safe', '0',
+            '-protocol_whitelist', 'file,pipe', '-i', 'pipe:0',
+            *codec_args, '-avoid_negative_ts', 'make_zero', output_path
+        ]
+        
+        print(f"Running ffmpeg to concatenate {len(files)} files...")
+        
+        try:
+            call_with_retry(lambda: self.run_ffmpeg(cmd, file_list), config.MAX_RETRIES, "ffmpeg")
+        except Exception:
+            print("Failed to concatenate videos after retries.")
+            return False
+        
+        print(f"Concatenated video saved to {output_path}")
+        return True
+    
+    def run_ffmpeg(self, cmd: List[str], input_data: Optional[bytes] = None) -> None:
+        """
+        Run an ffmpeg command once.
+        
+        Args:
+            cmd: ffmpeg command line
+            input_data: Optional data written to ffmpeg's stdin
             
-            time.sleep(2 ** attempt)
+        Raises:
+            RuntimeError: If ffmpeg exits with an error
+            subprocess.TimeoutExpired: If ffmpeg takes longer than 5 minutes
+        """
+        result = subprocess.run(
+            cmd, input=input_data, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, timeout=300
+        )
         
-        print("Failed to concatenate videos after retries.")
-        return False
+        if result.returncode != 0:
+            # Only the tail of ffmpeg's output is useful for diagnosing the failure
+            stderr_tail = result.stderr[-FFMPEG_STDERR_TAIL_BYTES:].decode(errors="replace")
+            raise RuntimeError(f"exit code {result.returncode}: {stderr_tail}")
     
     def cleanup_files(self, day_dir: str, files_to_delete: List[str]) -> None:
         """
@@ -101,21 +205,23 @@ class VideoProcessor:
             day_dir: Directory containing the files
             files_to_delete: List of filenames to delete
         """
+        prefix = os.path.join(day_dir, '')
         for file in files_to_delete:
             try:
-                file_path = os.path.join(day_dir, file)
-                if os.path.exists(file_path):
-                    os.remove(file_path)
-                    print(f"Deleted {file}")
+                os.unlink(prefix + file)
+                print(f"Deleted {file}")
+            except FileNotFoundError:
+                continue
             except Exception as e:
                 print(f"Failed to delete {file}: {e}")
     
-    def process_daily_videos(self, date_str: Optional[str] = None) -> bool:
+    def process_daily_videos(self, date_str: Optional[str] = None, upload: bool = True) -> bool:
         """
         Process all videos for a specific date: concatenate, upload to YouTube, and cleanup.
         
         Args:
             date_str: Date string in YYYY-MM-DD format. If None, uses today's date.
+            upload: Upload the combined video now, otherwise only add it to pending_uploads
             
         Returns:
             bool: True if processing was successful, False otherwise
@@ -138,21 +244,47 @@ class VideoProcessor:
         print(f"Found {len(files)} video files for {date_str}")
         
         # Create output path for concatenated video
-        output_filename = f"{date_str}_combined.mp4"
-        output_path = os.path.join(day_dir, output_filename)
+        output_path = os.path.join(day_dir, f"{date_str}{COMBINED_SUFFIX}")
         
         # Concatenate videos
         if not self.concatenate_videos(day_dir, files, output_path):
             return False
         
+        if not upload:
+            print("Upload postponed, keeping local files")
+            self.pending_uploads[date_str] = files
+            return False
+        
+        return self.upload_daily_video(date_str, files)
+    
+    def upload_daily_video(self, date_str: str, files: List[str]) -> bool:
+        """
+        Upload the combined video of a date and clean up the clips it was made from.
+        
+        If the upload fails, the local files are kept and the clips are remembered
+        in pending_uploads so retry_upload can upload the same video later.
+        
+        Args:
+            date_str: Date string in YYYY-MM-DD format
+            files: Filenames of the clips in the combined video
+            
+        Returns:
+            bool: True if the upload was successful, False otherwise
+        """
+        day_dir = os.path.join(config.DATA_DIR, date_str)
+        output_filename = f"{date_str}{COMBINED_SUFFIX}"
+        output_path = os.path.join(day_dir, output_filename)
+        
         # Upload to YouTube
         title = f"{config.YOUTUBE_UPLOAD_TITLE_PREFIX} {date_str}"
         upload_success = self.youtube_uploader.upload_video(output_path, title)
         
         if upload_success:
+            self.pending_uploads.pop(date_str, None)
             print("Upload successful, cleaning up local files...")
-            # Delete all original files, the file list, and the concatenated video
-            files_to_delete = files + ['files.txt', output_filename]
+            # Delete the clips in the combined video and the combined video itself,
+            # clips downloaded since then are kept for their own upload
+            files_to_delete = files + [output_filename]
             self.cleanup_files(day_dir, files_to_delete)
             
             # Remove the directory if it's empty
@@ -162,6 +294,25 @@ class VideoProcessor:
             except OSError:
                 print(f"Directory {day_dir} not empty, keeping it")
         else:
+            self.pending_uploads[date_str] = files
             print("Upload failed, keeping local files")
         
         return upload_success
+    
+    def retry_upload(self, date_str: str) -> bool:
+        """
+        Retry the upload of a combined video whose earlier upload failed.
+        
+        Args:
+            date_str: Date string in YYYY-MM-DD format
+            
+        Returns:
+            bool: True if the upload was successful, False otherwise
+        """
+        files = self.pending_uploads.get(date_str)
+        if files is None:
+            print(f"No pending upload for {date_str}")
+            return False
+        
+        print(f"Retrying upload of the combined video for {date_str}")
+        return self.upload_daily_video(date_str, files)
@@ -4,56 +4,108 @@ Video scraper module for fetching and downloading videos from RPI camera interfa
 
 import os
 import re
-import time
+import shutil
 import datetime
-from typing import List, Dict, Optional
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
+from functools import partial
+from typing import TYPE_CHECKING, Iterable, Iterator, List, Dict, Optional
 
-import requests
-from bs4 import BeautifulSoup, Tag
+import lxml.html
+from lxml import etree
 
 from .config import config
 
+if TYPE_CHECKING:
+    import requests
+
+# Pattern for the metadata shown in each video fieldset, one named group per field
+_METADATA_RE = re.compile(
+    r"(?P<size>\d+\s*[KMG]B)"
+    r"|(?P<duration>\d+s)"
+    r"|(?P<date>\d{4}-\d{2}-\d{2})"
+    r"|(?P<time>\d{2}:\d{2}:\d{2})"
+)
+
+# Compiled XPath queries for a video fieldset
+_HREF_XPATH = etree.XPath("(.//a/@href)[1]", smart_strings=False)
+_DELETE_VALUE_XPATH = etree.XPath("(.//button[@name='delete1']/@value)[1]", smart_strings=False)
+_TEXT_XPATH = etree.XPath(".//text()", smart_strings=False)
+
+# Rate limit and server errors that are retried by the session
+RETRY_STATUS_CODES = [429, 500, 502, 503, 504]
+
+# Size of the blocks fed to the incremental HTML parser
+PARSE_CHUNK_SIZE = 64 * 1024
+
+
+@dataclass(slots=True, frozen=True)
+class VideoMeta:
+    """Metadata of a video listed on the preview page."""
+    
+    video: str
+    thumbnail: Optional[str]
+    title: str = ""
+    size: str = ""
+    duration: str = ""
+    date: str = ""
+    time: str = ""
+
 
 class VideoScraper:
     """Handles scraping and downloading videos from the RPI camera web interface."""
     
     def __init__(self):
-        self.session = requests.Session()
+        # requests is slow to import, only load it when a scraper is created
+        import requests
+        from requests.adapters import HTTPAdapter
+        from urllib3.util.retry import Retry
+        
+        self.session: "requests.Session" = requests.Session()
+        
+        # Retry failed requests with exponential backoff inside urllib3, and size
+        # the connection pool so concurrent downloads can reuse connections
+        retry = Retry(
+            total=config.MAX_RETRIES,
+            backoff_factor=1,
+            status_forcelist=RETRY_STATUS_CODES,
+            allowed_methods=["GET", "POST"]
+        )
+        adapter = HTTPAdapter(max_retries=retry, pool_maxsize=max(1, config.DOWNLOAD_CONCURRENCY))
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
     
-    def parse_video_metadata(self, fieldset: Tag) -> Optional[Dict[str, str]]:
+    def parse_video_metadata(self, fieldset: lxml.html.HtmlElement) -> Optional[VideoMeta]:
         """
         Parse video metadata from a fieldset element.
         
         Args:
-            fieldset: BeautifulSoup Tag object representing a video fieldset
+            fieldset: lxml element representing a video fieldset
             
         Returns:
-            dict: Video metadata or None if parsing fails
+            VideoMeta: Video metadata or None if parsing fails
         """
         # Extract video link
-        a_tag = fieldset.find("a", href=True)
-        if not (a_tag and a_tag["href"].startswith("media/") and a_tag["href"].endswith(".mp4")):
+        hrefs = _HREF_XPATH(fieldset)
+        if not (hrefs and hrefs[0].startswith("media/") and hrefs[0].endswith(".mp4")):
             return None
         
-        video_url = a_tag["href"]
+        video_url = hrefs[0]
         
         # Thumbnail from delete button
-        delete_btn = fieldset.find("button", attrs={"name": "delete1"})
-        thumbnail = delete_btn["value"] if delete_btn else None
+        delete_values = _DELETE_VALUE_XPATH(fieldset)
+        thumbnail = delete_values[0] if delete_values else None
         
         # Extract metadata from fieldset text
-        details = fieldset.get_text(" ", strip=True)
+        details = " ".join(text.strip() for text in _TEXT_XPATH(fieldset) if text.strip())
         
-        # Try to extract size, duration, date, time using regex
-        size_match = re.search(r"(\d+ MB)", details)
-        duration_match = re.search(r"(\d+s)", details)
-        date_match = re.search(r"(\d{4}-\d{2}-\d{2})", details)
-        time_match = re.search(r"(\d{2}:\d{2}:\d{2})", details)
+        # Extract size, duration, date, time in a single scan, keeping the first match of each
+        fields: Dict[str, str] = {}
+        for match in _METADATA_RE.finditer(details):
+            fields.setdefault(match.lastgroup, match.group())
         
-        size = size_match.group(1) if size_match else ""
-        duration = duration_match.group(1) if duration_match else ""
-        date = date_match.group(1) if date_match else ""
-        time_str = time_match.group(1) if time_match else ""
+        date = fields.get("date", "")
+        time_str = fields.get("time", "")
         
         # Build title: date and time
         if date and time_str:
@@ -61,123 +113,200 @@ class VideoScraper:
         else:
             title = "Unknown DateTime"
         
-        return {
-            "video": video_url,
-            "thumbnail": thumbnail,
-            "title": title,
-            "size": size,
-            "duration": duration,
-            "date": date,
-            "time": time_str
-        }
+        return VideoMeta(
+            video=video_url,
+            thumbnail=thumbnail,
+            title=title,
+            size=fields.get("size", ""),
+            duration=fields.get("duration", ""),
+            date=date,
+            time=time_str
+        )
+    
+    def iter_video_fieldsets(self, chunks: Iterable[bytes]) -> Iterator[lxml.html.HtmlElement]:
+        """
+        Incrementally parse HTML and yield the video fieldsets.
+        
+        Each fieldset is discarded from the tree once the caller is done with it,
+        so only the fieldset being processed is kept in memory.
+        
+        Args:
+            chunks: Blocks of the HTML document
+            
+        Yields:
+            lxml element of each fieldset with the "fileicon" class
+        """
+        parser = etree.HTMLPullParser(events=("end",), tag="fieldset")
+        
+        def read_fieldsets():
+            for _, fieldset in parser.read_events():
+                if "fileicon" in (fieldset.get("class") or "").split():
+                    yield fieldset
+                
+                # Drop the fieldset's content and everything parsed before it
+                fieldset.clear()
+                while fieldset.getprevious() is not None:
+                    del fieldset.getparent()[0]
+        
+        for chunk in chunks:
+            parser.feed(chunk)
+            yield from read_fieldsets()
+        
+        parser.close()
+        yield from read_fieldsets()
     
-    def fetch_video_list(self) -> List[Dict[str, str]]:
+    def fetch_video_list(self) -> List[VideoMeta]:
         """
         Fetch the list of available videos from the camera interface.
         
         Returns:
-            list: List of video metadata dictionaries
+            list: List of video metadata
         """
-        for attempt in range(config.MAX_RETRIES):
-            try:
-                response = self.session.get(config.preview_url, timeout=config.REQUEST_TIMEOUT)
+        videos = []
+        
+        try:
+            with self.session.get(
+                config.preview_url, 
+                stream=True, 
+                timeout=config.REQUEST_TIMEOUT
+            ) as response:
                 if response.status_code != 200:
                     raise Exception(f"Preview page HTTP {response.status_code}")
                 
-                soup = BeautifulSoup(response.text, "html.parser")
-                break
-                
-            except Exception as e:
-                print(f"Error fetching preview page (attempt {attempt+1}): {e}")
-                time.sleep(2 ** attempt)
-        else:
-            print("Failed to fetch preview page after retries.")
+                # Parse the page while it is being downloaded
+                response.raw.decode_content = True
+                chunks = iter(partial(response.raw.read, PARSE_CHUNK_SIZE), b"")
+                for fieldset in self.iter_video_fieldsets(chunks):
+                    meta = self.parse_video_metadata(fieldset)
+                    if meta:
+                        videos.append(meta)
+            
+        except Exception as e:
+            print(f"Failed to fetch preview page: {e}")
             return []
         
-        videos = []
-        for fieldset in soup.find_all("fieldset", class_="fileicon"):
-            meta = self.parse_video_metadata(fieldset)
-            if meta:
-                videos.append(meta)
-        
         return videos
     
-    def download_video(self, video_meta: Dict[str, str], day_dir: str) -> bool:
+    def download_video(self, video_meta: VideoMeta, day_dir: str) -> bool:
         """
         Download a single video to the specified directory.
         
         Args:
-            video_meta: Video metadata dictionary
+            video_meta: Video metadata
             day_dir: Directory to save the video to
             
         Returns:
             bool: True if download was successful, False otherwise
         """
-        video_url = f"{config.BASE_URL.rstrip('/')}/{video_meta['video']}"
-        filename = video_meta['video'].split('/')[-1]
+        video_url = f"{config.BASE_URL.rstrip('/')}/{video_meta.video}"
+        filename = video_meta.video.split('/')[-1]
         local_path = os.path.join(day_dir, filename)
+        # Download under a temporary name so a failed download never leaves a truncated mp4
+        part_path = local_path + ".part"
         
         print(f"Downloading {filename} from {video_url}...")
         
-        for attempt in range(config.MAX_RETRIES):
-            try:
-                response = self.session.get(
-                    video_url, 
-                    stream=True, 
-                    timeout=config.DOWNLOAD_TIMEOUT
-                )
-                
-                if response.status_code == 200:
-                    with open(local_path, 'wb') as f:
-                        for chunk in response.iter_content(chunk_size=config.DOWNLOAD_CHUNK_SIZE):
-                            f.write(chunk)
-                    
-                    print(f"Downloaded {filename} to {local_path}")
-                    return True
-                else:
+        try:
+            with self.session.get(
+                video_url, 
+                stream=True, 
+                timeout=config.DOWNLOAD_TIMEOUT
+            ) as response:
+                if response.status_code != 200:
                     raise Exception(f"HTTP {response.status_code}")
-                    
-            except Exception as e:
-                print(f"Download error for {filename} (attempt {attempt+1}): {e}")
-                time.sleep(2 ** attempt)
+                
+                response.raw.decode_content = True
+                with open(part_path, 'wb') as f:
+                    shutil.copyfileobj(response.raw, f, length=config.DOWNLOAD_CHUNK_SIZE)
+                
+                # Compare the bytes received with the advertised length
+                expected_size = response.headers.get('Content-Length')
+                received_size = response.raw.tell()
+                if expected_size is not None and int(expected_size) != received_size:
+                    raise Exception(f"Incomplete download: {received_size} of {expected_size} bytes")
+            
+            os.replace(part_path, local_path)
+            
+        except Exception as e:
+            print(f"Failed to download {filename}: {e}")
+            try:
+                os.unlink(part_path)
+            except OSError:
+                pass
+            return False
         
-        print(f"Failed to download {filename} after retries.")
-        return False
+        print(f"Downloaded {filename} to {local_path}")
+        return True
     
-    def delete_video_from_server(self, video_meta: Dict[str, str]) -> bool:
+    def delete_video_from_server(self, video_meta: VideoMeta) -> bool:
         """
         Delete a video from the server using its thumbnail identifier.
         
         Args:
-            video_meta: Video metadata dictionary
+            video_meta: Video metadata
             
         Returns:
             bool: True if deletion request was successful, False otherwise
         """
-        if not video_meta.get('thumbnail'):
+        # Check before touching the network, a delete without a thumbnail cannot succeed
+        thumbnail = video_meta.thumbnail
+        if not thumbnail:
             print("No thumbnail found for server delete request.")
             return False
         
-        for attempt in range(config.MAX_RETRIES):
-            try:
-                delete_response = self.session.post(
-                    config.preview_url,
-                    data={'delete1': video_meta['thumbnail']},
-                    timeout=config.REQUEST_TIMEOUT
-                )
-                
-                if delete_response.status_code == 200:
-                    print(f"Server delete request sent for {video_meta['thumbnail']}")
-                    return True
-                else:
-                    raise Exception(f"HTTP {delete_response.status_code}")
-                    
-            except Exception as e:
-                print(f"Delete error for {video_meta['thumbnail']} (attempt {attempt+1}): {e}")
-                time.sleep(2 ** attempt)
-        
-        print(f"Failed to delete {video_meta['thumbnail']} on server after retries.")
-        return False
+        try:
+            delete_response = self.session.post(
+                config.preview_url,
+                data={'delete1': thumbnail},
+                timeout=config.REQUEST_TIMEOUT
+            )
+            if delete_response.status_code != 200:
+                raise Exception(f"HTTP {delete_response.status_code}")
+            
+        except Exception as e:
+            print(f"Failed to delete {thumbnail} on server: {e}")
+            return False
+        
+        print(f"Server delete request sent for {thumbnail}")
+        return True
+    
+    def download_all(
+        self, 
+        videos: List[VideoMeta], 
+        day_dir: str, 
+        max_workers: Optional[int] = None, 
+        delete_from_server: bool = False
+    ) -> List[VideoMeta]:
+        """
+        Download several videos concurrently.
+        
+        Args:
+            videos: List of video metadata
+            day_dir: Directory to save the videos to
+            max_workers: Number of parallel downloads, defaults to RPICAM_DOWNLOAD_CONCURRENCY
+            delete_from_server: Delete each video from the server once it is downloaded
+            
+        Returns:
+            list: Metadata of the videos that were downloaded successfully
+        """
+        if max_workers is None:
+            max_workers = config.DOWNLOAD_CONCURRENCY
+        
+        downloaded = []
+        with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+            futures = {
+                executor.submit(self.download_video, video_meta, day_dir): video_meta
+                for video_meta in videos
+            }
+            for future in as_completed(futures):
+                if future.result():
+                    video_meta = futures[future]
+                    downloaded.append(video_meta)
+                    # Queue the server delete on the same pool as soon as the download is done
+                    if delete_from_server:
+                        executor.submit(self.delete_video_from_server, video_meta)
+        
+        return downloaded
     
     def fetch_and_clean(self) -> None:
         """
@@ -193,8 +322,4 @@ class VideoScraper:
         day_dir = os.path.join(config.DATA_DIR, today)
         os.makedirs(day_dir, exist_ok=True)
         
-        for video_meta in videos:
-            # Download the video
-            if self.download_video(video_meta, day_dir):
-                # If download successful, delete from server
-                self.delete_video_from_server(video_meta)
+        self.download_all(videos, day_dir, delete_from_server=True)
@@ -2,33 +2,74 @@
 YouTube uploader module for handling authentication and video uploads.
 """
 
+import json
 import os
 import pickle
-import time
-from typing import Optional
-
-from google_auth_oauthlib.flow import InstalledAppFlow
-from googleapiclient.discovery import build
-from googleapiclient.http import MediaFileUpload
-from google.auth.transport.requests import Request
+from typing import TYPE_CHECKING, Callable, Optional
 
 from .config import config
+from .retry import call_with_retry
+
+if TYPE_CHECKING:
+    from googleapiclient.discovery import Resource
+    from googleapiclient.http import MediaFileUpload
+
+# Size of each resumable upload request (must be a multiple of 256 KiB)
+UPLOAD_CHUNK_SIZE = 8 * 1024 * 1024
+
+# Seconds to wait before retrying after hitting the YouTube rate limit
+RATE_LIMIT_DELAY = 3600
 
 
 class YouTubeUploader:
     """Handles YouTube authentication and video uploads."""
     
-    def __init__(self):
+    def __init__(self, on_rate_limit: Optional[Callable[[float], None]] = None):
+        """
+        Initialize the uploader.
+        
+        Args:
+            on_rate_limit: Optional callback that receives the rate limit delay in seconds.
+                When set, a rate limited upload fails right away so the caller can retry
+                it later, instead of blocking this thread for an hour.
+        """
         self.youtube_service = None
+        self.on_rate_limit = on_rate_limit
     
-    def get_authenticated_service(self):
+    def get_authenticated_service(self) -> "Resource":
         """Authenticate and return a YouTube API service object."""
+        # The service refreshes its own access token, so build it only once
+        if self.youtube_service:
+            return self.youtube_service
+        
+        # The Google client libraries are slow to import, only load them when needed
+        from google_auth_oauthlib.flow import InstalledAppFlow
+        from googleapiclient.discovery import build
+        from google.auth.transport.requests import Request
+        from google.oauth2.credentials import Credentials
+        
         creds = None
+        save_creds = False
         
         # Load credentials if they exist
         if os.path.exists(config.YOUTUBE_TOKEN_PATH):
-            with open(config.YOUTUBE_TOKEN_PATH, "rb") as token:
-                creds = pickle.load(token)
+            try:
+                with open(config.YOUTUBE_TOKEN_PATH, "r") as token:
+                    token_info = json.load(token)
+            except (json.JSONDecodeError, UnicodeDecodeError):
+                # Token written by an older version as a pickle, convert it to JSON
+                try:
+                    with open(config.YOUTUBE_TOKEN_PATH, "rb") as token:
+                        creds = pickle.load(token)
+                    save_creds = True
+                except (pickle.UnpicklingError, EOFError) as e:
+                    print(f"Stored YouTube token is unreadable, signing in again: {e}")
+            else:
+                try:
+                    creds = Credentials.from_authorized_user_info(token_info, config.YOUTUBE_SCOPES)
+                except ValueError as e:
+                    # Valid JSON with missing fields, run the OAuth flow again
+                    print(f"Stored YouTube token is incomplete, signing in again: {e}")
         
         # If no valid credentials, log in and save
         if not creds or not creds.valid:
@@ -40,12 +81,16 @@ class YouTubeUploader:
                     config.YOUTUBE_SCOPES
                 )
                 creds = flow.run_local_server(port=0)
-            
-            # Save credentials for next run
-            with open(config.YOUTUBE_TOKEN_PATH, "wb") as token:
-                pickle.dump(creds, token)
+            save_creds = True
         
-        self.youtube_service = build("youtube", "v3", credentials=creds)
+        # Save credentials for next run
+        if save_creds:
+            with open(config.YOUTUBE_TOKEN_PATH, "w") as token:
+                token.write(creds.to_json())
+        
+        # google-api-python-client 2.x already builds from its bundled discovery document
+        # by default, state it explicitly so a network fetch is never reintroduced
+        self.youtube_service = build("youtube", "v3", credentials=creds, static_discovery=True)
         return self.youtube_service
     
     def upload_video(self, file_path: str, title: str, description: Optional[str] = None) -> bool:
@@ -60,8 +105,9 @@ class YouTubeUploader:
         Returns:
             bool: True if upload was successful, False otherwise
         """
-        if not self.youtube_service:
-            self.get_authenticated_service()
+        from googleapiclient.http import MediaFileUpload
+        
+        self.get_authenticated_service()
         
         body = {
             "snippet": {
@@ -75,36 +121,92 @@ class YouTubeUploader:
             }
         }
         
-        media = MediaFileUpload(file_path, chunksize=-1, resumable=True)
+        media = MediaFileUpload(
+            file_path, 
+            mimetype="video/mp4", 
+            chunksize=UPLOAD_CHUNK_SIZE, 
+            resumable=True
+        )
         
-        for attempt in range(config.MAX_RETRIES):
-            try:
-                request = self.youtube_service.videos().insert(
-                    part=",".join(body.keys()),
-                    body=body,
-                    media_body=media
-                )
-                
-                response = None
-                while response is None:
-                    status, response = request.next_chunk()
-                    if status:
-                        print(f"Upload progress: {int(status.progress() * 100)}%")
-                
-                print(f"Upload complete: https://youtu.be/{response['id']}")
-                return True
-                
-            except Exception as e:
-                print(f"YouTube upload error (attempt {attempt+1}): {e}")
-                
-                # Check for rate limit error
-                if hasattr(e, 'resp') and e.resp and e.resp.status == 403:
-                    print("YouTube rate limit hit. Waiting 1 hour before retrying...")
-                    time.sleep(3600)
-                else:
-                    wait = 2 ** attempt
-                    print(f"Retrying upload in {wait} seconds...")
-                    time.sleep(wait)
-        
-        print("Upload failed after retries.")
-        return False
+        try:
+            response = call_with_retry(
+                lambda: self.execute_upload(body, media),
+                config.MAX_RETRIES,
+                "YouTube upload",
+                get_delay=self.rate_limit_delay,
+                should_retry=self.should_retry_upload
+            )
+        except Exception as e:
+            if self.on_rate_limit and self.is_rate_limit(e):
+                print("YouTube rate limit hit, deferring the upload.")
+                self.on_rate_limit(RATE_LIMIT_DELAY)
+            else:
+                print("Upload failed after retries.")
+            return False
+        
+        print(f"Upload complete: https://youtu.be/{response['id']}")
+        return True
+    
+    def execute_upload(self, body: dict, media: "MediaFileUpload") -> dict:
+        """
+        Run a single resumable upload request to completion.
+        
+        Args:
+            body: Video resource metadata
+            media: Media upload for the video file
+            
+        Returns:
+            dict: The uploaded video resource
+        """
+        request = self.youtube_service.videos().insert(
+            part=",".join(body.keys()),
+            body=body,
+            media_body=media
+        )
+        
+        response = None
+        while response is None:
+            status, response = request.next_chunk()
+            if status:
+                print(f"Upload progress: {int(status.progress() * 100)}%")
+        
+        return response
+    
+    def is_rate_limit(self, error: Exception) -> bool:
+        """
+        Check if an upload error is a YouTube rate limit error.
+        
+        Args:
+            error: Error raised by an upload attempt
+            
+        Returns:
+            bool: True if the error is an HTTP 403 response
+        """
+        return bool(hasattr(error, 'resp') and error.resp and error.resp.status == 403)
+    
+    def should_retry_upload(self, error: Exception) -> bool:
+        """
+        Check if an upload error should be retried in place.
+        
+        Args:
+            error: Error raised by an upload attempt
+            
+        Returns:
+            bool: False for a rate limit error when on_rate_limit handles it, True otherwise
+        """
+        return not (self.on_rate_limit and self.is_rate_limit(error))
+    
+    def rate_limit_delay(self, error: Exception) -> Optional[float]:
+        """
+        Get the retry delay for a rate limit error.
+        
+        Args:
+            error: Error raised by an upload attempt
+            
+        Returns:
+            float: One hour for a rate limit error, None to use the default backoff
+        """
+        if self.is_rate_limit(error):
+            print("YouTube rate limit hit. Waiting 1 hour before retrying...")
+            return RATE_LIMIT_DELAY
+        return None
@@ -2,6 +2,102 @@
 
 import os
 import sys
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import pytest
 
 # Add the src directory to the Python path
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from rpicam_scraper.config import Config, config
+from rpicam_scraper.scheduler import RPiCamScheduler
+from rpicam_scraper.video_scraper import VideoScraper
+from rpicam_scraper.video_processor import VideoProcessor
+from rpicam_scraper.youtube_uploader import YouTubeUploader
+
+
+# Modules whose config is replaced by the mock_config fixture
+CONFIG_MODULES = [
+    "rpicam_scraper.video_scraper",
+    "rpicam_scraper.video_processor",
+    "rpicam_scraper.youtube_uploader",
+    "rpicam_scraper.scheduler",
+]
+
+# Settings seen by the application modules during tests
+TEST_CONFIG = {
+    "BASE_URL": "http://test.com",
+    "preview_url": "http://test.com/preview.php",
+    "YOUTUBE_CLIENT_SECRETS": "client_secrets.json",
+    "YOUTUBE_TOKEN_PATH": "token.json",
+    "YOUTUBE_SCOPES": ["https://www.googleapis.com/auth/youtube.upload"],
+    "YOUTUBE_UPLOAD_TITLE_PREFIX": "RPiCam",
+    "YOUTUBE_UPLOAD_DESCRIPTION": "Uploaded by RPI-Cam-Web-Interface-Scraper",
+    "youtube_tags_list": ["RPiCam", "AutoUpload"],
+    "YOUTUBE_UPLOAD_CATEGORY": "22",
+    "YOUTUBE_PRIVACY_STATUS": "unlisted",
+    "DATA_DIR": "/test/data",
+    "MAX_RETRIES": 3,
+    "REQUEST_TIMEOUT": 30,
+    "DOWNLOAD_TIMEOUT": 60,
+    "DOWNLOAD_CHUNK_SIZE": 1048576,
+    "DOWNLOAD_CONCURRENCY": 4,
+    "ENABLE_SCHEDULER": True,
+    "SCRAPE_INTERVAL_MINUTES": 15,
+    "DAILY_PROCESS_TIME": "23:59",
+}
+
+
+@pytest.fixture(autouse=True)
+def mock_config(monkeypatch):
+    """Replace the config of the application modules with test settings that tests can override."""
+    test_config = SimpleNamespace(**TEST_CONFIG)
+    for module in CONFIG_MODULES:
+        monkeypatch.setattr(f"{module}.config", test_config)
+    return test_config
+
+
+@pytest.fixture
+def config_env(monkeypatch):
+    """Unset the configuration environment variables and return a function to set some of them."""
+    for name in Config._ENV_KEYS:
+        monkeypatch.delenv(name, raising=False)
+    
+    # Make the global config re-read the test environment, and not keep it afterwards
+    config.reset_cache()
+    
+    def set_env(env_vars):
+        for name, value in env_vars.items():
+            monkeypatch.setenv(name, value)
+    
+    yield set_env
+    
+    config.reset_cache()
+
+
+@pytest.fixture
+def scraper(mock_config):
+    """VideoScraper built with the test config."""
+    return VideoScraper()
+
+
+@pytest.fixture
+def processor():
+    """VideoProcessor with a mocked YouTube uploader."""
+    with patch('rpicam_scraper.video_processor.YouTubeUploader'):
+        return VideoProcessor()
+
+
+@pytest.fixture
+def uploader():
+    """YouTubeUploader without an authenticated service."""
+    return YouTubeUploader()
+
+
+@pytest.fixture
+def scheduler(mock_config):
+    """RPiCamScheduler with a mocked scraper and processor."""
+    with patch('rpicam_scraper.scheduler.VideoScraper'), \
+         patch('rpicam_scraper.scheduler.VideoProcessor'):
+        return RPiCamScheduler()
@@ -1,27 +1,24 @@
 """Tests for the configuration module."""
 
-import os
 import pytest
-from unittest.mock import patch
 
-from rpicam_scraper.config import Config
+from rpicam_scraper.config import Config, _LazyConfig
 
 
 class TestConfig:
     """Test cases for the Config class."""
     
-    def test_config_initialization(self):
+    def test_config_initialization(self, config_env):
         """Test config initialization with default values."""
-        with patch.dict(os.environ, {}, clear=True):
-            config = Config()
-            assert config.BASE_URL == ""
-            assert config.YOUTUBE_CLIENT_SECRETS == "client_secrets.json"
-            assert config.YOUTUBE_TOKEN_PATH == "token.pickle"
-            assert config.DATA_DIR == "/data/videos"
-            assert config.MAX_RETRIES == 5
-            assert config.REQUEST_TIMEOUT == 30
+        config = Config()
+        assert config.BASE_URL == ""
+        assert config.YOUTUBE_CLIENT_SECRETS == "client_secrets.json"
+        assert config.YOUTUBE_TOKEN_PATH == "token.pickle"
+        assert config.DATA_DIR == "/data/videos"
+        assert config.MAX_RETRIES == 5
+        assert config.REQUEST_TIMEOUT == 30
     
-    def test_config_with_environment_variables(self):
+    def test_config_with_environment_variables(self, config_env):
         """Test config with environment variables set."""
         env_vars = {
             "RPICAM_BASE_URL": "https://test.example.com/",
@@ -30,79 +27,117 @@ class TestConfig:
             "RPICAM_MAX_RETRIES": "10"
         }
         
-        with patch.dict(os.environ, env_vars, clear=True):
-            config = Config()
-            assert config.BASE_URL == "https://test.example.com/"
-            assert config.YOUTUBE_CLIENT_SECRETS == "test_secret.json"
-            assert config.DATA_DIR == "/test/data"
-            assert config.MAX_RETRIES == 10
+        config_env(env_vars)
+        config = Config()
+        assert config.BASE_URL == "https://test.example.com/"
+        assert config.YOUTUBE_CLIENT_SECRETS == "test_secret.json"
+        assert config.DATA_DIR == "/test/data"
+        assert config.MAX_RETRIES == 10
     
-    def test_preview_url_property(self):
+    def test_preview_url_property(self, config_env):
         """Test the preview_url property."""
         env_vars = {"RPICAM_BASE_URL": "https://test.example.com/path"}
         
-        with patch.dict(os.environ, env_vars, clear=True):
-            config = Config()
-            assert config.preview_url == "https://test.example.com/path/preview.php"
+        config_env(env_vars)
+        config = Config()
+        assert config.preview_url == "https://test.example.com/path/preview.php"
     
-    def test_preview_url_with_trailing_slash(self):
+    def test_preview_url_with_trailing_slash(self, config_env):
         """Test preview_url property with trailing slash in base URL."""
         env_vars = {"RPICAM_BASE_URL": "https://test.example.com/path/"}
         
-        with patch.dict(os.environ, env_vars, clear=True):
-            config = Config()
-            assert config.preview_url == "https://test.example.com/path/preview.php"
+        config_env(env_vars)
+        config = Config()
+        assert config.preview_url == "https://test.example.com/path/preview.php"
     
-    def test_preview_url_without_base_url(self):
+    def test_preview_url_without_base_url(self, config_env):
         """Test preview_url property raises error when base URL is missing."""
-        with patch.dict(os.environ, {}, clear=True):
-            config = Config()
-            with pytest.raises(ValueError, match="RPICAM_BASE_URL environment variable is required"):
-                _ = config.preview_url
+        config = Config()
+        with pytest.raises(ValueError, match="RPICAM_BASE_URL environment variable is required"):
+            _ = config.preview_url
     
-    def test_youtube_tags_list_property(self):
+    def test_youtube_tags_list_property(self, config_env):
         """Test the youtube_tags_list property."""
         env_vars = {"YOUTUBE_UPLOAD_TAGS": "tag1,tag2, tag3 ,tag4"}
         
-        with patch.dict(os.environ, env_vars, clear=True):
-            config = Config()
-            assert config.youtube_tags_list == ["tag1", "tag2", "tag3", "tag4"]
+        config_env(env_vars)
+        config = Config()
+        assert config.youtube_tags_list == ["tag1", "tag2", "tag3", "tag4"]
+        # The list is computed once and reused
+        assert config.youtube_tags_list is config.youtube_tags_list
     
-    def test_youtube_tags_list_empty(self):
+    def test_youtube_tags_list_empty(self, config_env):
         """Test youtube_tags_list with empty tags."""
         env_vars = {"YOUTUBE_UPLOAD_TAGS": ""}
         
-        with patch.dict(os.environ, env_vars, clear=True):
-            config = Config()
-            assert config.youtube_tags_list == []
+        config_env(env_vars)
+        config = Config()
+        assert config.youtube_tags_list == []
     
-    def test_validate_success(self):
+    def test_validate_success(self, config_env):
         """Test successful validation."""
         env_vars = {"RPICAM_BASE_URL": "https://test.example.com/"}
         
-        with patch.dict(os.environ, env_vars, clear=True):
-            config = Config()
-            config.validate()  # Should not raise
+        config_env(env_vars)
+        config = Config()
+        config.validate()  # Should not raise
     
-    def test_validate_missing_base_url(self):
+    def test_validate_missing_base_url(self, config_env):
         """Test validation fails when base URL is missing."""
-        with patch.dict(os.environ, {}, clear=True):
-            config = Config()
-            with pytest.raises(ValueError, match="Missing required environment variables: RPICAM_BASE_URL"):
-                config.validate()
+        config = Config()
+        with pytest.raises(ValueError, match="Missing required environment variables: RPICAM_BASE_URL"):
+            config.validate()
     
-    def test_integer_conversion(self):
+    def test_integer_conversion(self, config_env):
         """Test integer environment variable conversion."""
         env_vars = {
             "RPICAM_MAX_RETRIES": "3",
             "RPICAM_REQUEST_TIMEOUT": "45",
             "RPICAM_DOWNLOAD_TIMEOUT": "120",
-            "RPICAM_DOWNLOAD_CHUNK_SIZE": "16384"
+            "RPICAM_DOWNLOAD_CHUNK_SIZE": "16384",
+            "RPICAM_DOWNLOAD_CONCURRENCY": "2"
         }
         
-        with patch.dict(os.environ, env_vars, clear=True):
-            config = Config()
-            assert config.MAX_RETRIES == 3
-            assert config.REQUEST_TIMEOUT == 45
-            assert config.DOWNLOAD_TIMEOUT == 120
-            assert config.DOWNLOAD_CHUNK_SIZE == 16384
+        config_env(env_vars)
+        config = Config()
+        assert config.MAX_RETRIES == 3
+        assert config.REQUEST_TIMEOUT == 45
+        assert config.DOWNLOAD_TIMEOUT == 120
+        assert config.DOWNLOAD_CHUNK_SIZE == 16384
+        assert config.DOWNLOAD_CONCURRENCY == 2
+
+
+class TestLazyConfig:
+    """Test cases for the lazily constructed global config."""
+    
+    def test_environment_parsed_on_first_access(self, config_env):
+        """Test that the environment is only read when an attribute is accessed."""
+        lazy_config = _LazyConfig()
+        
+        config_env({"RPICAM_BASE_URL": "https://lazy.example.com/"})
+        assert lazy_config.BASE_URL == "https://lazy.example.com/"
+        
+        # The instance is cached, later environment changes are ignored
+        config_env({"RPICAM_BASE_URL": "https://other.example.com/"})
+        assert lazy_config.BASE_URL == "https://lazy.example.com/"
+        assert lazy_config.preview_url == "https://lazy.example.com/preview.php"
+    
+    def test_reset_cache(self, config_env):
+        """Test that reset_cache makes the next access re-read the environment."""
+        lazy_config = _LazyConfig()
+        
+        config_env({"RPICAM_MAX_RETRIES": "3"})
+        assert lazy_config.MAX_RETRIES == 3
+        
+        lazy_config.reset_cache()
+        
+        config_env({"RPICAM_MAX_RETRIES": "7"})
+        assert lazy_config.MAX_RETRIES == 7
+    
+    def test_global_config_reads_test_environment(self, config_env):
+        """Test that the global config is rebuilt from the environment set by config_env."""
+        from rpicam_scraper.config import config
+        
+        config_env({"RPICAM_BASE_URL": "https://global.example.com/"})
+        
+        assert config.BASE_URL == "https://global.example.com/"
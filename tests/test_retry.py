@@ -0,0 +1,63 @@
+"""Tests for the retry module."""
+
+import pytest
+from unittest.mock import Mock, patch, call
+
+from rpicam_scraper.retry import backoff_delay, call_with_retry
+
+
+class TestRetry:
+    """Test cases for the retry helpers."""
+    
+    def test_backoff_delay_without_jitter(self):
+        """Test exponential backoff delays without jitter."""
+        assert [backoff_delay(attempt, jitter=False) for attempt in range(4)] == [1, 2, 4, 8]
+        assert backoff_delay(2, base_delay=0.5, jitter=False) == 2
+    
+    def test_backoff_delay_with_jitter(self):
+        """Test that jitter stays within +/-50% of the delay."""
+        for _ in range(100):
+            assert 2 <= backoff_delay(2) <= 6
+    
+    @patch('time.sleep')
+    def test_call_with_retry_success_after_failures(self, mock_sleep):
+        """Test that the function is retried until it succeeds."""
+        func = Mock(side_effect=[Exception("first"), Exception("second"), "result"])
+        
+        result = call_with_retry(func, 5, "test", jitter=False)
+        
+        assert result == "result"
+        assert func.call_count == 3
+        mock_sleep.assert_has_calls([call(1), call(2)])
+    
+    @patch('time.sleep')
+    def test_call_with_retry_raises_last_error(self, mock_sleep):
+        """Test that the last error is raised once all attempts fail."""
+        func = Mock(side_effect=[ValueError("first"), ValueError("last")])
+        
+        with pytest.raises(ValueError, match="last"):
+            call_with_retry(func, 2, "test")
+        
+        assert func.call_count == 2
+        assert mock_sleep.call_count == 1
+    
+    @patch('time.sleep')
+    def test_call_with_retry_custom_delay(self, mock_sleep):
+        """Test that get_delay can override the backoff delay."""
+        func = Mock(side_effect=[Exception("rate limit"), Exception("other"), "result"])
+        get_delay = Mock(side_effect=[3600, None])
+        
+        call_with_retry(func, 3, "test", jitter=False, get_delay=get_delay)
+        
+        mock_sleep.assert_has_calls([call(3600), call(2)])
+    
+    @patch('time.sleep')
+    def test_call_with_retry_should_retry(self, mock_sleep):
+        """Test that errors rejected by should_retry are raised without retrying."""
+        func = Mock(side_effect=ValueError("fatal"))
+        
+        with pytest.raises(ValueError, match="fatal"):
+            call_with_retry(func, 5, "test", should_retry=lambda e: False)
+        
+        func.assert_called_once()
+        mock_sleep.assert_not_called()
@@ -0,0 +1,178 @@
+"""Tests for the scheduler module."""
+
+import datetime
+import threading
+from types import SimpleNamespace
+from unittest.mock import call, patch
+
+from rpicam_scraper.scheduler import RPiCamScheduler
+
+
+def fake_clock(*args):
+    """Return a stand-in for the datetime module whose datetime.now() returns datetime.current."""
+    class FakeDateTime(datetime.datetime):
+        current = datetime.datetime(*args)
+        
+        @classmethod
+        def now(cls, tz=None):
+            return cls.current
+    
+    return SimpleNamespace(datetime=FakeDateTime, timedelta=datetime.timedelta)
+
+
+def fake_uploads(scheduler, rate_limited):
+    """
+    Make the mocked processor track pending uploads like VideoProcessor.
+    
+    Each upload attempt takes the next value of rate_limited, True means it hits the rate limit.
+    """
+    processor = scheduler.processor
+    processor.pending_uploads = {}
+    attempts = iter(rate_limited)
+    
+    def attempt_upload(date_str):
+        if next(attempts):
+            scheduler.defer_upload(3600)
+            processor.pending_uploads[date_str] = ['clip.mp4']
+            return False
+        processor.pending_uploads.pop(date_str, None)
+        return True
+    
+    def process_daily_videos(date_str, upload=True):
+        if not upload:
+            processor.pending_uploads[date_str] = ['clip.mp4']
+            return False
+        return attempt_upload(date_str)
+    
+    processor.process_daily_videos.side_effect = process_daily_videos
+    processor.retry_upload.side_effect = attempt_upload
+    return processor
+
+
+class TestRPiCamScheduler:
+    """Test cases for the RPiCamScheduler class."""
+    
+    def test_next_daily_process_time_later_today(self, scheduler):
+        """Test next daily process time when the target is still ahead today."""
+        now = datetime.datetime(2025, 8, 12, 10, 30)
+        
+        assert scheduler.next_daily_process_time(now) == datetime.datetime(2025, 8, 12, 23, 59)
+    
+    def test_next_daily_process_time_tomorrow(self, scheduler):
+        """Test next daily process time when today's target has passed."""
+        now = datetime.datetime(2025, 8, 12, 23, 59, 30)
+        
+        assert scheduler.next_daily_process_time(now) == datetime.datetime(2025, 8, 13, 23, 59)
+    
+    def test_invalid_daily_process_time_uses_default(self, mock_config):
+        """Test that an invalid daily process time falls back to 23:59."""
+        mock_config.DAILY_PROCESS_TIME = "invalid"
+        with patch('rpicam_scraper.scheduler.VideoScraper'), \
+             patch('rpicam_scraper.scheduler.VideoProcessor'):
+            scheduler = RPiCamScheduler()
+        
+        now = datetime.datetime(2025, 8, 12, 10, 30)
+        assert scheduler.next_daily_process_time(now) == datetime.datetime(2025, 8, 12, 23, 59)
+    
+    def test_stop_wakes_sleeping_scheduler(self, scheduler):
+        """Test that stop() ends the scheduler loop without waiting for the next event."""
+        scraped = threading.Event()
+        scheduler.scraper.fetch_and_clean.side_effect = scraped.set
+        
+        with patch.object(RPiCamScheduler, 'should_run_daily_process', return_value=False):
+            thread = scheduler.start()
+            assert scraped.wait(timeout=5)
+            scheduler.stop()
+            thread.join(timeout=5)
+        
+        assert not thread.is_alive()
+        scheduler.scraper.fetch_and_clean.assert_called_once()
+    
+    def test_deferred_upload_crosses_midnight(self, scheduler):
+        """Test that an upload deferred past midnight still uploads the previous day's video."""
+        clock = fake_clock(2025, 8, 12, 23, 59, 30)
+        processor = fake_uploads(scheduler, rate_limited=[True, False])
+        
+        with patch('rpicam_scraper.scheduler.datetime', clock):
+            assert scheduler.should_run_daily_process()
+            scheduler.run_daily_process()
+            processor.process_daily_videos.assert_called_once_with("2025-08-12", upload=True)
+            assert list(processor.pending_uploads) == ["2025-08-12"]
+            
+            # Still rate limited shortly after midnight
+            clock.datetime.current = datetime.datetime(2025, 8, 13, 0, 30)
+            assert not scheduler.should_run_pending_uploads()
+            assert not scheduler.should_run_daily_process()
+            
+            # Once the delay has passed only the upload of 08-12 is retried
+            clock.datetime.current = datetime.datetime(2025, 8, 13, 1, 0)
+            assert scheduler.should_run_pending_uploads()
+            assert not scheduler.should_run_daily_process()
+            scheduler.run_pending_uploads()
+            
+            processor.retry_upload.assert_called_once_with("2025-08-12")
+            processor.process_daily_videos.assert_called_once()
+            assert processor.pending_uploads == {}
+            
+            # The new day is processed at its own time
+            clock.datetime.current = datetime.datetime(2025, 8, 13, 23, 59, 30)
+            assert scheduler.should_run_daily_process()
+    
+    def test_overlapping_deferred_uploads(self, scheduler):
+        """Test that a day still pending is retried after the next day is rate limited too."""
+        clock = fake_clock(2025, 8, 12, 23, 59, 30)
+        processor = fake_uploads(scheduler, rate_limited=[True, True, True, False, False])
+        
+        with patch('rpicam_scraper.scheduler.datetime', clock):
+            scheduler.run_daily_process()
+            
+            # The retry of 08-12 hits the rate limit again
+            clock.datetime.current = datetime.datetime(2025, 8, 13, 1, 0)
+            scheduler.run_pending_uploads()
+            
+            # And so does the upload of 08-13
+            clock.datetime.current = datetime.datetime(2025, 8, 13, 23, 59, 30)
+            scheduler.run_daily_process()
+            assert sorted(processor.pending_uploads) == ["2025-08-12", "2025-08-13"]
+            
+            # Both days are uploaded once the rate limit has passed
+            clock.datetime.current = datetime.datetime(2025, 8, 14, 1, 0)
+            assert scheduler.should_run_pending_uploads()
+            scheduler.run_pending_uploads()
+        
+        assert processor.retry_upload.call_args_list == [
+            call("2025-08-12"), call("2025-08-12"), call("2025-08-13")
+        ]
+        assert processor.pending_uploads == {}
+    
+    def test_daily_process_postpones_upload_while_rate_limited(self, scheduler):
+        """Test that videos are combined but not uploaded during a rate limit, which is kept."""
+        clock = fake_clock(2025, 8, 13, 23, 59, 30)
+        processor = fake_uploads(scheduler, rate_limited=[])
+        processor.pending_uploads["2025-08-12"] = ['clip.mp4']
+        
+        with patch('rpicam_scraper.scheduler.datetime', clock):
+            scheduler.rate_limited_until = datetime.datetime(2025, 8, 14, 0, 30)
+            scheduler.run_daily_process()
+            
+            processor.process_daily_videos.assert_called_once_with("2025-08-13", upload=False)
+            assert sorted(processor.pending_uploads) == ["2025-08-12", "2025-08-13"]
+            assert scheduler.last_daily_process == datetime.date(2025, 8, 13)
+            
+            # The deadline of the earlier date is not cleared by the new day's run
+            assert scheduler.is_rate_limited()
+            assert not scheduler.should_run_pending_uploads()
+    
+    def test_pending_uploads_stop_at_new_rate_limit(self, scheduler):
+        """Test that retries stop once an upload hits the rate limit again."""
+        processor = fake_uploads(scheduler, rate_limited=[True])
+        processor.pending_uploads.update({"2025-08-12": ['clip.mp4'], "2025-08-13": ['clip.mp4']})
+        
+        scheduler.run_pending_uploads()
+        
+        processor.retry_upload.assert_called_once_with("2025-08-12")
+        assert sorted(processor.pending_uploads) == ["2025-08-12", "2025-08-13"]
+    
+    def test_rate_limit_callback_is_registered(self, scheduler):
+        """Test that the scheduler defers uploads that hit the rate limit."""
+        assert scheduler.processor.youtube_uploader.on_rate_limit == scheduler.defer_upload
@@ -1,47 +1,60 @@
 """Tests for the video processor module."""
 
 import os
+import subprocess
 import pytest
 from unittest.mock import Mock, patch, MagicMock, call
 
 from rpicam_scraper.video_processor import VideoProcessor
 
 
+@pytest.fixture(autouse=True)
+def mock_run(monkeypatch):
+    """Mock subprocess.run so no test can start a real ffmpeg or ffprobe."""
+    run = Mock()
+    monkeypatch.setattr(subprocess, 'run', run)
+    return run
+
+
 class TestVideoProcessor:
     """Test cases for the VideoProcessor class."""
     
-    def setup_method(self):
-        """Set up test fixtures."""
-        with patch('rpicam_scraper.video_processor.YouTubeUploader'):
-            self.processor = VideoProcessor()
-    
-    @patch('os.path.exists')
-    @patch('os.listdir')
-    def test_get_video_files_success(self, mock_listdir, mock_exists):
+    @patch('os.scandir')
+    def test_get_video_files_success(self, mock_scandir, processor):
         """Test getting video files from directory."""
-        mock_exists.return_value = True
-        mock_listdir.return_value = ['video1.mp4', 'video2.mp4', 'other.txt', 'video3.mp4']
+        entries = []
+        for name, is_file in [('video3.mp4', True), ('video1.mp4', True), ('other.txt', True),
+                              ('video2.mp4', True), ('folder.mp4', False),
+                              ('2025-08-12_combined.mp4', True)]:
+            entry = Mock()
+            entry.name = name
+            entry.is_file.return_value = is_file
+            entries.append(entry)
+        mock_scandir.return_value.__enter__.return_value = iter(entries)
         
-        result = self.processor.get_video_files('/test/dir')
+        result = processor.get_video_files('/test/dir')
         
         assert result == ['video1.mp4', 'video2.mp4', 'video3.mp4']
-        mock_exists.assert_called_once_with('/test/dir')
-        mock_listdir.assert_called_once_with('/test/dir')
+        mock_scandir.assert_called_once_with('/test/dir')
+        # Entries are filtered by name before is_file() so other files are never stat'ed
+        entries[2].is_file.assert_not_called()
+        # A combined video left by a failed upload is never an input clip
+        entries[5].is_file.assert_not_called()
     
-    @patch('os.path.exists')
-    def test_get_video_files_directory_not_exists(self, mock_exists):
+    @patch('os.scandir')
+    def test_get_video_files_directory_not_exists(self, mock_scandir, processor):
         """Test getting video files when directory doesn't exist."""
-        mock_exists.return_value = False
+        mock_scandir.side_effect = FileNotFoundError
         
-        result = self.processor.get_video_files('/nonexistent/dir')
+        result = processor.get_video_files('/nonexistent/dir')
         
         assert result == []
-        mock_exists.assert_called_once_with('/nonexistent/dir')
+        mock_scandir.assert_called_once_with('/nonexistent/dir')
     
     @patch('builtins.open', create=True)
     @patch('os.path.abspath')
     @patch('os.path.join')
-    def test_create_ffmpeg_file_list(self, mock_join, mock_abspath, mock_open):
+    def test_create_ffmpeg_file_list(self, mock_join, mock_abspath, mock_open, processor):
         """Test creating ffmpeg file list."""
         mock_join.side_effect = lambda *args: '/'.join(args)
         mock_abspath.side_effect = lambda x: f'/abs{x}'
@@ -50,133 +63,255 @@ class TestVideoProcessor:
         mock_open.return_value.__enter__.return_value = mock_file
         
         files = ['video1.mp4', 'video2.mp4']
-        result = self.processor.create_ffmpeg_file_list('/test/dir', files)
+        result = processor.create_ffmpeg_file_list('/test/dir', files)
         
         assert result == '/test/dir/files.txt'
-        mock_file.write.assert_has_calls([
-            call("file '/abs/test/dir/video1.mp4'\n"),
-            call("file '/abs/test/dir/video2.mp4'\n")
-        ])
+        mock_file.write.assert_called_once_with(
+            "file 'file:/abs/test/dir/video1.mp4'\n"
+            "file 'file:/abs/test/dir/video2.mp4'\n"
+        )
     
-    @patch('rpicam_scraper.video_processor.config')
-    @patch('subprocess.run')
-    @patch.object(VideoProcessor, 'create_ffmpeg_file_list')
-    def test_concatenate_videos_success(self, mock_create_list, mock_run, mock_config):
+    @patch('os.path.join')
+    @patch('os.path.abspath')
+    def test_build_ffmpeg_file_list(self, mock_abspath, mock_join, processor):
+        """Test building the ffmpeg file list contents."""
+        mock_abspath.side_effect = lambda x: f'/abs{x}'
+        
+        result = processor.build_ffmpeg_file_list('/test/dir', ['video1.mp4', 'video2.mp4'])
+        
+        assert result == (
+            "file 'file:/abs/test/dir/video1.mp4'\n"
+            "file 'file:/abs/test/dir/video2.mp4'\n"
+        )
+        # The directory is resolved once and paths are built without os.path.join per file
+        mock_abspath.assert_called_once_with('/test/dir')
+        mock_join.assert_not_called()
+    
+    @patch.object(VideoProcessor, 'videos_are_compatible', return_value=True)
+    @patch.object(VideoProcessor, 'build_ffmpeg_file_list')
+    def test_concatenate_videos_success(self, mock_build_list, mock_compatible, mock_run, processor):
         """Test successful video concatenation."""
-        mock_config.MAX_RETRIES = 3
-        mock_create_list.return_value = '/test/dir/files.txt'
+        mock_build_list.return_value = "file '/test/dir/video1.mp4'\n"
         
         mock_result = Mock()
         mock_result.returncode = 0
         mock_run.return_value = mock_result
         
         files = ['video1.mp4', 'video2.mp4']
-        result = self.processor.concatenate_videos('/test/dir', files, '/test/output.mp4')
+        result = processor.concatenate_videos('/test/dir', files, '/test/output.mp4')
         
         assert result is True
         mock_run.assert_called_once()
         call_args = mock_run.call_args[0][0]
         assert 'ffmpeg' in call_args
         assert '/test/output.mp4' in call_args
+        assert mock_run.call_args[1]['stdout'] == subprocess.DEVNULL
+        assert mock_run.call_args[1]['stderr'] == subprocess.PIPE
+        # ffmpeg only reports errors, without banner or progress output
+        assert call_args[call_args.index('-loglevel') + 1] == 'error'
+        assert '-nostats' in call_args
+        assert call_args[call_args.index('-c') + 1] == 'copy'
+        # The file list is piped to ffmpeg instead of written to disk
+        assert call_args[call_args.index('-i') + 1] == 'pipe:0'
+        assert mock_run.call_args[1]['input'] == b"file '/test/dir/video1.mp4'\n"
     
-    @patch('rpicam_scraper.video_processor.config')
-    @patch('subprocess.run')
-    @patch.object(VideoProcessor, 'create_ffmpeg_file_list')
-    def test_concatenate_videos_failure(self, mock_create_list, mock_run, mock_config):
+    @patch.object(VideoProcessor, 'videos_are_compatible', return_value=False)
+    @patch.object(VideoProcessor, 'build_ffmpeg_file_list')
+    def test_concatenate_videos_reencodes_incompatible(self, mock_build_list, mock_compatible, mock_run, processor):
+        """Test that incompatible videos are re-encoded instead of stream copied."""
+        mock_build_list.return_value = "file '/test/dir/video1.mp4'\n"
+        
+        mock_result = Mock()
+        mock_result.returncode = 0
+        mock_run.return_value = mock_result
+        
+        result = processor.concatenate_videos('/test/dir', ['video1.mp4', 'video2.mp4'], '/test/output.mp4')
+        
+        assert result is True
+        call_args = mock_run.call_args[0][0]
+        assert '-c' not in call_args
+        assert call_args[call_args.index('-c:v') + 1] == 'libx264'
+    
+    def test_videos_are_compatible(self, mock_run, processor):
+        """Test comparing the stream info of the first and last video."""
+        mock_run.side_effect = [
+            Mock(returncode=0, stdout=b"h264,1920,1080\n"),
+            Mock(returncode=0, stdout=b"h264,1280,720\n")
+        ]
+        
+        result = processor.videos_are_compatible('/test/dir', ['video1.mp4', 'video2.mp4', 'video3.mp4'])
+        
+        assert result is False
+        assert mock_run.call_count == 2
+        assert mock_run.call_args_list[0][0][0][-1] == '/test/dir/video1.mp4'
+        assert mock_run.call_args_list[1][0][0][-1] == '/test/dir/video3.mp4'
+    
+    def test_videos_are_compatible_probe_failure(self, mock_run, processor):
+        """Test that a failed probe falls back to stream copy."""
+        mock_run.side_effect = FileNotFoundError("ffprobe")
+        
+        result = processor.videos_are_compatible('/test/dir', ['video1.mp4', 'video2.mp4'])
+        
+        assert result is True
+    
+    @patch('time.sleep')
+    @patch.object(VideoProcessor, 'videos_are_compatible', return_value=True)
+    @patch.object(VideoProcessor, 'build_ffmpeg_file_list')
+    def test_concatenate_videos_failure(self, mock_build_list, mock_compatible, mock_sleep, mock_run, mock_config, processor, capsys):
         """Test failed video concatenation."""
         mock_config.MAX_RETRIES = 2
-        mock_create_list.return_value = '/test/dir/files.txt'
+        mock_build_list.return_value = "file '/test/dir/video1.mp4'\n"
         
         mock_result = Mock()
         mock_result.returncode = 1
-        mock_result.stderr = "FFmpeg error"
+        mock_result.stderr = b"FFmpeg error"
         mock_run.return_value = mock_result
         
         files = ['video1.mp4', 'video2.mp4']
-        result = self.processor.concatenate_videos('/test/dir', files, '/test/output.mp4')
+        result = processor.concatenate_videos('/test/dir', files, '/test/output.mp4')
         
         assert result is False
         assert mock_run.call_count == 2  # Should retry
+        assert mock_sleep.call_count == 1  # No wait after the last attempt
+        assert "ffmpeg error (attempt 2): exit code 1: FFmpeg error" in capsys.readouterr().out
     
-    @patch('os.path.exists')
-    @patch('os.remove')
-    def test_cleanup_files_success(self, mock_remove, mock_exists):
+    @patch('os.unlink')
+    def test_cleanup_files_success(self, mock_unlink, processor):
         """Test successful file cleanup."""
-        mock_exists.return_value = True
-        
         files = ['file1.txt', 'file2.txt']
-        self.processor.cleanup_files('/test/dir', files)
+        processor.cleanup_files('/test/dir', files)
         
-        mock_remove.assert_has_calls([
+        mock_unlink.assert_has_calls([
             call('/test/dir/file1.txt'),
             call('/test/dir/file2.txt')
         ])
     
     @patch('os.path.exists')
-    @patch('os.remove')
-    def test_cleanup_files_with_error(self, mock_remove, mock_exists):
+    @patch('os.unlink')
+    def test_cleanup_files_with_error(self, mock_unlink, mock_exists, processor, capsys):
         """Test file cleanup with errors."""
-        mock_exists.return_value = True
-        mock_remove.side_effect = [None, OSError("Permission denied")]
+        mock_unlink.side_effect = [None, FileNotFoundError("Missing"), OSError("Permission denied")]
         
-        files = ['file1.txt', 'file2.txt']
+        files = ['file1.txt', 'file2.txt', 'file3.txt']
         # Should not raise exception
-        self.processor.cleanup_files('/test/dir', files)
+        processor.cleanup_files('/test/dir', files)
         
-        assert mock_remove.call_count == 2
+        assert mock_unlink.call_count == 3
+        # Missing files are skipped by unlink itself, without a separate exists check
+        mock_exists.assert_not_called()
+        output = capsys.readouterr().out
+        assert "Deleted file2.txt" not in output
+        assert "Failed to delete file3.txt: Permission denied" in output
     
-    @patch('rpicam_scraper.video_processor.config')
     @patch('datetime.datetime')
     @patch('os.path.exists')
     @patch.object(VideoProcessor, 'get_video_files')
-    def test_process_daily_videos_no_directory(self, mock_get_files, mock_exists, mock_datetime, mock_config):
+    def test_process_daily_videos_no_directory(self, mock_get_files, mock_exists, mock_datetime, mock_config, processor):
         """Test processing when directory doesn't exist."""
         mock_datetime.now.return_value.strftime.return_value = "2025-08-12"
         mock_config.DATA_DIR = "/data"
         mock_exists.return_value = False
         
-        result = self.processor.process_daily_videos()
+        result = processor.process_daily_videos()
         
         assert result is False
         mock_exists.assert_called_once_with('/data/2025-08-12')
     
-    @patch('rpicam_scraper.video_processor.config')
     @patch('datetime.datetime')
     @patch('os.path.exists')
     @patch.object(VideoProcessor, 'get_video_files')
-    def test_process_daily_videos_no_files(self, mock_get_files, mock_exists, mock_datetime, mock_config):
+    def test_process_daily_videos_no_files(self, mock_get_files, mock_exists, mock_datetime, mock_config, processor):
         """Test processing when no video files exist."""
         mock_datetime.now.return_value.strftime.return_value = "2025-08-12"
         mock_config.DATA_DIR = "/data"
         mock_exists.return_value = True
         mock_get_files.return_value = []
         
-        result = self.processor.process_daily_videos()
+        result = processor.process_daily_videos()
         
         assert result is False
     
-    @patch('rpicam_scraper.video_processor.config')
     @patch('os.path.exists')
     @patch.object(VideoProcessor, 'get_video_files')
     @patch.object(VideoProcessor, 'concatenate_videos')
     @patch.object(VideoProcessor, 'cleanup_files')
     @patch('os.rmdir')
-    def test_process_daily_videos_success(self, mock_rmdir, mock_cleanup, mock_concat, mock_get_files, mock_exists, mock_config):
+    def test_process_daily_videos_success(self, mock_rmdir, mock_cleanup, mock_concat, mock_get_files, mock_exists, mock_config, processor):
         """Test successful daily video processing."""
         mock_config.DATA_DIR = "/data"
-        mock_config.YOUTUBE_UPLOAD_TITLE_PREFIX = "RPiCam"
         mock_exists.return_value = True
         mock_get_files.return_value = ['video1.mp4', 'video2.mp4']
         mock_concat.return_value = True
         
         # Mock YouTube uploader
-        self.processor.youtube_uploader.upload_video.return_value = True
+        processor.youtube_uploader.upload_video.return_value = True
         
-        result = self.processor.process_daily_videos("2025-08-12")
+        result = processor.process_daily_videos("2025-08-12")
         
         assert result is True
         mock_concat.assert_called_once()
-        self.processor.youtube_uploader.upload_video.assert_called_once_with(
+        processor.youtube_uploader.upload_video.assert_called_once_with(
+            '/data/2025-08-12/2025-08-12_combined.mp4',
+            'RPiCam 2025-08-12'
+        )
+        assert processor.pending_uploads == {}
+    
+    @patch('os.path.exists')
+    @patch.object(VideoProcessor, 'get_video_files')
+    @patch.object(VideoProcessor, 'concatenate_videos')
+    @patch.object(VideoProcessor, 'cleanup_files')
+    def test_process_daily_videos_upload_failure_is_pending(self, mock_cleanup, mock_concat, mock_get_files, mock_exists, processor):
+        """Test that a failed upload keeps the files and remembers the clips of the combined video."""
+        mock_exists.return_value = True
+        mock_get_files.return_value = ['video1.mp4', 'video2.mp4']
+        mock_concat.return_value = True
+        processor.youtube_uploader.upload_video.return_value = False
+        
+        result = processor.process_daily_videos("2025-08-12")
+        
+        assert result is False
+        mock_cleanup.assert_not_called()
+        assert processor.pending_uploads == {"2025-08-12": ['video1.mp4', 'video2.mp4']}
+    
+    @patch('os.path.exists')
+    @patch.object(VideoProcessor, 'get_video_files')
+    @patch.object(VideoProcessor, 'concatenate_videos')
+    def test_process_daily_videos_without_upload(self, mock_concat, mock_get_files, mock_exists, processor):
+        """Test that the upload can be postponed after combining the videos."""
+        mock_exists.return_value = True
+        mock_get_files.return_value = ['video1.mp4', 'video2.mp4']
+        mock_concat.return_value = True
+        
+        result = processor.process_daily_videos("2025-08-12", upload=False)
+        
+        assert result is False
+        mock_concat.assert_called_once()
+        processor.youtube_uploader.upload_video.assert_not_called()
+        assert processor.pending_uploads == {"2025-08-12": ['video1.mp4', 'video2.mp4']}
+    
+    @patch('os.rmdir')
+    @patch.object(VideoProcessor, 'concatenate_videos')
+    @patch.object(VideoProcessor, 'cleanup_files')
+    def test_retry_upload(self, mock_cleanup, mock_concat, mock_rmdir, mock_config, processor):
+        """Test that a retry uploads the existing combined video and only deletes its clips."""
+        mock_config.DATA_DIR = "/data"
+        processor.pending_uploads["2025-08-12"] = ['video1.mp4', 'video2.mp4']
+        processor.youtube_uploader.upload_video.return_value = True
+        
+        result = processor.retry_upload("2025-08-12")
+        
+        assert result is True
+        mock_concat.assert_not_called()
+        processor.youtube_uploader.upload_video.assert_called_once_with(
             '/data/2025-08-12/2025-08-12_combined.mp4',
             'RPiCam 2025-08-12'
         )
+        mock_cleanup.assert_called_once_with(
+            '/data/2025-08-12', ['video1.mp4', 'video2.mp4', '2025-08-12_combined.mp4']
+        )
+        assert processor.pending_uploads == {}
+    
+    def test_retry_upload_without_pending_upload(self, processor):
+        """Test that retry_upload does nothing when no upload is pending."""
+        assert processor.retry_upload("2025-08-12") is False
+        processor.youtube_uploader.upload_video.assert_not_called()
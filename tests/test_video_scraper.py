@@ -1,20 +1,17 @@
 """Tests for the video scraper module."""
 
+import io
 import pytest
 from unittest.mock import Mock, patch, MagicMock
-from bs4 import BeautifulSoup
+import lxml.html
 
-from rpicam_scraper.video_scraper import VideoScraper
+from rpicam_scraper.video_scraper import VideoMeta, VideoScraper
 
 
 class TestVideoScraper:
     """Test cases for the VideoScraper class."""
     
-    def setup_method(self):
-        """Set up test fixtures."""
-        self.scraper = VideoScraper()
-    
-    def test_parse_video_metadata_valid(self):
+    def test_parse_video_metadata_valid(self, scraper):
         """Test parsing valid video metadata."""
         html = """
         <fieldset class="fileicon">
@@ -24,49 +21,99 @@ class TestVideoScraper:
             <span>26 MB 19s 2025-08-12 19:52:10</span>
         </fieldset>
         """
-        soup = BeautifulSoup(html, 'html.parser')
-        fieldset = soup.find('fieldset')
+        fieldset = lxml.html.fromstring(html)
+        
+        result = scraper.parse_video_metadata(fieldset)
+        
+        assert result is not None
+        assert result.video == 'media/video001.mp4'
+        assert result.thumbnail == 'thumb001'
+        assert result.title == '2025-08-12 19:52:10'
+        assert result.size == '26 MB'
+        assert result.duration == '19s'
+        assert result.date == '2025-08-12'
+        assert result.time == '19:52:10'
+    
+    def test_parse_video_metadata_split_text(self, scraper):
+        """Test parsing metadata spread over several elements."""
+        html = """
+        <fieldset class="fileicon">
+            <a href="media/video001.mp4">001</a>
+            <button name="delete1" value="thumb001">Delete</button>
+            <span>26</span> MB<br><b>19s</b><i>2025-08-12</i><i>19:52:10</i>
+        </fieldset>
+        """
+        fieldset = lxml.html.fromstring(html)
         
-        result = self.scraper.parse_video_metadata(fieldset)
+        result = scraper.parse_video_metadata(fieldset)
         
         assert result is not None
-        assert result['video'] == 'media/video001.mp4'
-        assert result['thumbnail'] == 'thumb001'
-        assert result['title'] == '2025-08-12 19:52:10'
-        assert result['size'] == '26 MB'
-        assert result['duration'] == '19s'
-        assert result['date'] == '2025-08-12'
-        assert result['time'] == '19:52:10'
-    
-    def test_parse_video_metadata_invalid_href(self):
+        assert result.size == '26 MB'
+        assert result.duration == '19s'
+        assert result.title == '2025-08-12 19:52:10'
+    
+    def test_parse_video_metadata_reordered_fields(self, scraper):
+        """Test parsing metadata fields that appear in a different order."""
+        html = """
+        <fieldset class="fileicon">
+            <a href="media/video001.mp4">001</a>
+            <span>2025-08-12 19:52:10 19s 26 MB 2025-08-13</span>
+        </fieldset>
+        """
+        fieldset = lxml.html.fromstring(html)
+        
+        result = scraper.parse_video_metadata(fieldset)
+        
+        assert result is not None
+        assert result.thumbnail is None
+        assert result.size == '26 MB'
+        assert result.duration == '19s'
+        assert result.date == '2025-08-12'
+        assert result.time == '19:52:10'
+    
+    @pytest.mark.parametrize("size", ["512 KB", "26 MB", "2 GB", "26MB"])
+    def test_parse_video_metadata_size_units(self, size, scraper):
+        """Test parsing file sizes in different units."""
+        html = f"""
+        <fieldset class="fileicon">
+            <a href="media/video001.mp4">001</a>
+            <span>{size} 19s 2025-08-12 19:52:10</span>
+        </fieldset>
+        """
+        fieldset = lxml.html.fromstring(html)
+        
+        result = scraper.parse_video_metadata(fieldset)
+        
+        assert result.size == size
+        assert result.duration == '19s'
+    
+    def test_parse_video_metadata_invalid_href(self, scraper):
         """Test parsing with invalid href."""
         html = """
         <fieldset class="fileicon">
             <a href="invalid/file.txt">001</a>
         </fieldset>
         """
-        soup = BeautifulSoup(html, 'html.parser')
-        fieldset = soup.find('fieldset')
+        fieldset = lxml.html.fromstring(html)
         
-        result = self.scraper.parse_video_metadata(fieldset)
+        result = scraper.parse_video_metadata(fieldset)
         
         assert result is None
     
-    def test_parse_video_metadata_no_href(self):
+    def test_parse_video_metadata_no_href(self, scraper):
         """Test parsing with no href."""
         html = """
         <fieldset class="fileicon">
             <span>No video link</span>
         </fieldset>
         """
-        soup = BeautifulSoup(html, 'html.parser')
-        fieldset = soup.find('fieldset')
+        fieldset = lxml.html.fromstring(html)
         
-        result = self.scraper.parse_video_metadata(fieldset)
+        result = scraper.parse_video_metadata(fieldset)
         
         assert result is None
     
-    def test_parse_video_metadata_missing_datetime(self):
+    def test_parse_video_metadata_missing_datetime(self, scraper):
         """Test parsing with missing date/time information."""
         html = """
         <fieldset class="fileicon">
@@ -75,24 +122,26 @@ class TestVideoScraper:
             <span>26 MB 19s</span>
         </fieldset>
         """
-        soup = BeautifulSoup(html, 'html.parser')
-        fieldset = soup.find('fieldset')
+        fieldset = lxml.html.fromstring(html)
         
-        result = self.scraper.parse_video_metadata(fieldset)
+        result = scraper.parse_video_metadata(fieldset)
         
         assert result is not None
-        assert result['title'] == 'Unknown DateTime'
-        assert result['date'] == ''
-        assert result['time'] == ''
+        assert result.title == 'Unknown DateTime'
+        assert result.date == ''
+        assert result.time == ''
+    
+    def test_video_meta_is_frozen_with_slots(self):
+        """Test that VideoMeta has a fixed shape and cannot be modified."""
+        meta = VideoMeta(video='media/video001.mp4', thumbnail='thumb001')
+        
+        assert not hasattr(meta, '__dict__')
+        with pytest.raises(AttributeError):
+            meta.video = 'media/video002.mp4'
     
-    @patch('rpicam_scraper.video_scraper.config')
     @patch('requests.Session.get')
-    def test_fetch_video_list_success(self, mock_get, mock_config):
+    def test_fetch_video_list_success(self, mock_get, scraper):
         """Test successful video list fetching."""
-        mock_config.preview_url = "http://test.com/preview.php"
-        mock_config.REQUEST_TIMEOUT = 30
-        mock_config.MAX_RETRIES = 5
-        
         html_content = """
         <html>
             <body>
@@ -101,6 +150,9 @@ class TestVideoScraper:
                     <button name="delete1" value="thumb001">Delete</button>
                     <span>26 MB 19s 2025-08-12 19:52:10</span>
                 </fieldset>
+                <fieldset class="settings">
+                    <a href="media/ignored.mp4">ignored</a>
+                </fieldset>
                 <fieldset class="fileicon">
                     <a href="media/video002.mp4">002</a>
                     <button name="delete1" value="thumb002">Delete</button>
@@ -110,59 +162,83 @@ class TestVideoScraper:
         </html>
         """
         
-        mock_response = Mock()
+        mock_response = MagicMock()
+        mock_response.__enter__.return_value = mock_response
         mock_response.status_code = 200
-        mock_response.text = html_content
+        mock_response.raw = io.BytesIO(html_content.encode())
         mock_get.return_value = mock_response
         
-        videos = self.scraper.fetch_video_list()
+        videos = scraper.fetch_video_list()
         
         assert len(videos) == 2
-        assert videos[0]['video'] == 'media/video001.mp4'
-        assert videos[1]['video'] == 'media/video002.mp4'
-        mock_get.assert_called_once_with("http://test.com/preview.php", timeout=30)
+        assert videos[0].video == 'media/video001.mp4'
+        assert videos[1].video == 'media/video002.mp4'
+        mock_get.assert_called_once_with("http://test.com/preview.php", stream=True, timeout=30)
+    
+    def test_iter_video_fieldsets_small_chunks(self, scraper):
+        """Test that fieldsets split over many chunks are parsed correctly."""
+        html = "<html><body><h1>Preview</h1>" + "".join(
+            f"""
+            <fieldset class="fileicon">
+                <a href="media/video{i:03d}.mp4">{i:03d}</a>
+                <button name="delete1" value="thumb{i:03d}">Delete</button>
+                <span>26 MB 19s 2025-08-12 19:52:{i:02d}</span>
+            </fieldset>
+            <fieldset class="other"><a href="media/skip.mp4">skip</a></fieldset>
+            """
+            for i in range(20)
+        ) + "</body></html>"
+        data = html.encode()
+        chunks = [data[i:i + 7] for i in range(0, len(data), 7)]
+        
+        videos = [scraper.parse_video_metadata(fieldset) for fieldset in scraper.iter_video_fieldsets(chunks)]
+        
+        assert [video.thumbnail for video in videos] == [f"thumb{i:03d}" for i in range(20)]
+        assert videos[-1].time == '19:52:19'
     
-    @patch('rpicam_scraper.video_scraper.config')
     @patch('requests.Session.get')
-    def test_fetch_video_list_http_error(self, mock_get, mock_config):
+    def test_fetch_video_list_http_error(self, mock_get, scraper):
         """Test video list fetching with HTTP error."""
-        mock_config.preview_url = "http://test.com/preview.php"
-        mock_config.REQUEST_TIMEOUT = 30
-        mock_config.MAX_RETRIES = 2
-        
-        mock_response = Mock()
+        mock_response = MagicMock()
+        mock_response.__enter__.return_value = mock_response
         mock_response.status_code = 404
         mock_get.return_value = mock_response
         
-        videos = self.scraper.fetch_video_list()
+        videos = scraper.fetch_video_list()
         
         assert videos == []
-        assert mock_get.call_count == 2  # Should retry
+        # Retries happen inside the session adapter, not in Python
+        assert mock_get.call_count == 1
+    
+    def test_session_retry_configuration(self, mock_config):
+        """Test that the session retries server errors through urllib3."""
+        mock_config.MAX_RETRIES = 4
+        mock_config.DOWNLOAD_CONCURRENCY = 2
+        
+        scraper = VideoScraper()
+        
+        for prefix in ("http://", "https://"):
+            adapter = scraper.session.get_adapter(prefix)
+            assert adapter.max_retries.total == 4
+            assert adapter.max_retries.status_forcelist == [429, 500, 502, 503, 504]
+            assert adapter.max_retries.respect_retry_after_header
+            assert "POST" in adapter.max_retries.allowed_methods
     
-    @patch('rpicam_scraper.video_scraper.config')
     @patch('requests.Session.get')
-    @patch('builtins.open', create=True)
-    def test_download_video_success(self, mock_open, mock_get, mock_config):
+    def test_download_video_success(self, mock_get, mock_config, scraper, tmp_path):
         """Test successful video download."""
         mock_config.BASE_URL = "http://test.com/"
-        mock_config.DOWNLOAD_TIMEOUT = 60
-        mock_config.DOWNLOAD_CHUNK_SIZE = 8192
-        mock_config.MAX_RETRIES = 5
         
-        video_meta = {
-            'video': 'media/video001.mp4',
-            'thumbnail': 'thumb001'
-        }
+        video_meta = VideoMeta(video='media/video001.mp4', thumbnail='thumb001')
         
-        mock_response = Mock()
+        mock_response = MagicMock()
+        mock_response.__enter__.return_value = mock_response
         mock_response.status_code = 200
-        mock_response.iter_content.return_value = [b'chunk1', b'chunk2']
+        mock_response.raw = io.BytesIO(b'chunk1chunk2')
+        mock_response.headers = {'Content-Length': '12'}
         mock_get.return_value = mock_response
         
-        mock_file = MagicMock()
-        mock_open.return_value.__enter__.return_value = mock_file
-        
-        result = self.scraper.download_video(video_meta, "/test/dir")
+        result = scraper.download_video(video_meta, str(tmp_path))
         
         assert result is True
         mock_get.assert_called_once_with(
@@ -170,24 +246,80 @@ class TestVideoScraper:
             stream=True,
             timeout=60
         )
-        mock_file.write.assert_any_call(b'chunk1')
-        mock_file.write.assert_any_call(b'chunk2')
+        # The temporary file is renamed to the video name once complete
+        assert [path.name for path in tmp_path.iterdir()] == ['video001.mp4']
+        assert (tmp_path / 'video001.mp4').read_bytes() == b'chunk1chunk2'
+    
+    @patch('os.replace')
+    @patch('requests.Session.get')
+    @patch('builtins.open', create=True)
+    def test_download_video_copies_raw_stream(self, mock_open, mock_get, mock_replace, mock_config, scraper):
+        """Test that the raw stream is decoded and copied in blocks of the configured size."""
+        mock_config.BASE_URL = "http://test.com/"
+        mock_config.DOWNLOAD_CHUNK_SIZE = 4
+        
+        mock_response = MagicMock()
+        mock_response.__enter__.return_value = mock_response
+        mock_response.status_code = 200
+        mock_response.raw = io.BytesIO(b'chunk1chunk2')
+        mock_response.headers = {}
+        mock_get.return_value = mock_response
+        
+        mock_file = MagicMock()
+        mock_open.return_value.__enter__.return_value = mock_file
+        
+        result = scraper.download_video(VideoMeta(video='media/video001.mp4', thumbnail='thumb001'), "/test/dir")
+        
+        assert result is True
+        assert mock_response.raw.decode_content is True
+        mock_response.iter_content.assert_not_called()
+        assert [c.args[0] for c in mock_file.write.call_args_list] == [b'chun', b'k1ch', b'unk2']
+    
+    @patch('requests.Session.get')
+    def test_download_video_incomplete(self, mock_get, mock_config, scraper, tmp_path):
+        """Test that a truncated download is treated as a failure."""
+        mock_config.BASE_URL = "http://test.com/"
+        
+        video_meta = VideoMeta(video='media/video001.mp4', thumbnail='thumb001')
+        
+        mock_response = MagicMock()
+        mock_response.__enter__.return_value = mock_response
+        mock_response.status_code = 200
+        mock_response.raw = io.BytesIO(b'chunk1')
+        mock_response.headers = {'Content-Length': '12'}
+        mock_get.return_value = mock_response
+        
+        result = scraper.download_video(video_meta, str(tmp_path))
+        
+        assert result is False
+        # Neither the truncated video nor the temporary file is left behind
+        assert list(tmp_path.iterdir()) == []
+    
+    @patch('requests.Session.get')
+    def test_download_video_stream_error_removes_file(self, mock_get, scraper, tmp_path):
+        """Test that a download failing mid-stream leaves no partial file."""
+        mock_response = MagicMock()
+        mock_response.__enter__.return_value = mock_response
+        mock_response.status_code = 200
+        mock_response.raw = Mock()
+        mock_response.raw.read.side_effect = [b'chunk1', ConnectionError("Connection reset")]
+        mock_get.return_value = mock_response
+        
+        result = scraper.download_video(VideoMeta(video='media/video001.mp4', thumbnail='thumb001'), str(tmp_path))
+        
+        assert result is False
+        assert list(tmp_path.iterdir()) == []
     
-    @patch('rpicam_scraper.video_scraper.config')
     @patch('requests.Session.post')
-    def test_delete_video_from_server_success(self, mock_post, mock_config):
+    def test_delete_video_from_server_success(self, mock_post, scraper):
         """Test successful video deletion from server."""
-        mock_config.preview_url = "http://test.com/preview.php"
-        mock_config.REQUEST_TIMEOUT = 30
-        mock_config.MAX_RETRIES = 5
-        
-        video_meta = {'thumbnail': 'thumb001'}
+        video_meta = VideoMeta(video='media/video001.mp4', thumbnail='thumb001')
         
         mock_response = Mock()
         mock_response.status_code = 200
         mock_post.return_value = mock_response
         
-        result = self.scraper.delete_video_from_server(video_meta)
+        result = scraper.delete_video_from_server(video_meta)
         
         assert result is True
         mock_post.assert_called_once_with(
@@ -196,10 +328,49 @@ class TestVideoScraper:
             timeout=30
         )
     
-    def test_delete_video_from_server_no_thumbnail(self):
+    @patch('os.makedirs')
+    @patch.object(VideoScraper, 'delete_video_from_server')
+    @patch.object(VideoScraper, 'download_video')
+    @patch.object(VideoScraper, 'fetch_video_list')
+    def test_fetch_and_clean_deletes_downloaded_videos(self, mock_fetch, mock_download, mock_delete, mock_makedirs, mock_config, scraper):
+        """Test that only successfully downloaded videos are deleted from the server."""
+        mock_config.DATA_DIR = "/data"
+        mock_config.DOWNLOAD_CONCURRENCY = 2
+        
+        videos = [
+            VideoMeta(video='media/video001.mp4', thumbnail='thumb001'),
+            VideoMeta(video='media/video002.mp4', thumbnail='thumb002'),
+            VideoMeta(video='media/video003.mp4', thumbnail='thumb003')
+        ]
+        mock_fetch.return_value = videos
+        mock_download.side_effect = lambda video_meta, day_dir: video_meta.thumbnail != 'thumb002'
+        
+        scraper.fetch_and_clean()
+        
+        assert mock_download.call_count == 3
+        deleted = sorted(c.args[0].thumbnail for c in mock_delete.call_args_list)
+        assert deleted == ['thumb001', 'thumb003']
+    
+    @patch.object(VideoScraper, 'delete_video_from_server')
+    @patch.object(VideoScraper, 'download_video')
+    def test_download_all(self, mock_download, mock_delete, scraper):
+        """Test downloading several videos without deleting them from the server."""
+        videos = [VideoMeta(video=f'media/video{i:03d}.mp4', thumbnail=f'thumb{i:03d}') for i in range(5)]
+        mock_download.side_effect = lambda video_meta, day_dir: video_meta.thumbnail != 'thumb003'
+        
+        downloaded = scraper.download_all(videos, "/test/dir", max_workers=3)
+        
+        assert sorted(video.thumbnail for video in downloaded) == ['thumb000', 'thumb001', 'thumb002', 'thumb004']
+        assert mock_download.call_count == 5
+        mock_delete.assert_not_called()
+    
+    @patch('requests.Session.post')
+    def test_delete_video_from_server_no_thumbnail(self, mock_post, scraper):
         """Test video deletion with no thumbnail."""
-        video_meta = {}
+        video_meta = VideoMeta(video='media/video001.mp4', thumbnail=None)
         
-        result = self.scraper.delete_video_from_server(video_meta)
+        result = scraper.delete_video_from_server(video_meta)
         
         assert result is False
+        # No request is sent for a video without a thumbnail
+        mock_post.assert_not_called()
@@ -4,57 +4,64 @@ import os
 import pytest
 from unittest.mock import Mock, patch, mock_open
 
-from rpicam_scraper.youtube_uploader import YouTubeUploader
-
 
 class TestYouTubeUploader:
     """Test cases for the YouTubeUploader class."""
     
-    def setup_method(self):
-        """Set up test fixtures."""
-        self.uploader = YouTubeUploader()
-    
-    @patch('rpicam_scraper.youtube_uploader.config')
     @patch('os.path.exists')
-    @patch('builtins.open', new_callable=mock_open)
-    @patch('pickle.load')
-    @patch('rpicam_scraper.youtube_uploader.build')
-    def test_get_authenticated_service_existing_token(self, mock_build, mock_pickle, mock_file, mock_exists, mock_config):
+    @patch('builtins.open', new_callable=mock_open, read_data='{"token": "abc"}')
+    @patch('google.oauth2.credentials.Credentials')
+    @patch('googleapiclient.discovery.build')
+    def test_get_authenticated_service_existing_token(self, mock_build, mock_credentials, mock_file, mock_exists, mock_config, uploader):
         """Test authentication with existing valid token."""
-        mock_config.YOUTUBE_TOKEN_PATH = "token.pickle"
+        mock_config.YOUTUBE_SCOPES = ["scope1"]
         mock_exists.return_value = True
         
         mock_creds = Mock()
         mock_creds.valid = True
-        mock_pickle.return_value = mock_creds
+        mock_credentials.from_authorized_user_info.return_value = mock_creds
         
         mock_service = Mock()
         mock_build.return_value = mock_service
         
-        result = self.uploader.get_authenticated_service()
+        result = uploader.get_authenticated_service()
         
         assert result == mock_service
-        assert self.uploader.youtube_service == mock_service
-        mock_exists.assert_called_once_with("token.pickle")
-        mock_build.assert_called_once_with("youtube", "v3", credentials=mock_creds)
+        assert uploader.youtube_service == mock_service
+        mock_exists.assert_called_once_with("token.json")
+        mock_credentials.from_authorized_user_info.assert_called_once_with({"token": "abc"}, ["scope1"])
+        mock_build.assert_called_once_with("youtube", "v3", credentials=mock_creds, static_discovery=True)
+        # A valid token is not written back
+        mock_file.return_value.write.assert_not_called()
     
-    @patch('rpicam_scraper.youtube_uploader.config')
     @patch('os.path.exists')
-    @patch('builtins.open', new_callable=mock_open)
-    @patch('pickle.load')
-    @patch('pickle.dump')
-    @patch('rpicam_scraper.youtube_uploader.build')
-    @patch('rpicam_scraper.youtube_uploader.Request')
-    def test_get_authenticated_service_expired_token(self, mock_request, mock_build, mock_dump, mock_pickle, mock_file, mock_exists, mock_config):
+    @patch('googleapiclient.discovery.build')
+    def test_get_authenticated_service_cached(self, mock_build, mock_exists, uploader):
+        """Test that an existing service is reused without re-authenticating."""
+        mock_service = Mock()
+        uploader.youtube_service = mock_service
+        
+        result = uploader.get_authenticated_service()
+        
+        assert result == mock_service
+        mock_exists.assert_not_called()
+        mock_build.assert_not_called()
+    
+    @patch('os.path.exists')
+    @patch('builtins.open', new_callable=mock_open, read_data='{"token": "abc"}')
+    @patch('google.oauth2.credentials.Credentials')
+    @patch('googleapiclient.discovery.build')
+    @patch('google.auth.transport.requests.Request')
+    def test_get_authenticated_service_expired_token(self, mock_request, mock_build, mock_credentials, mock_file, mock_exists, uploader):
         """Test authentication with expired token that can be refreshed."""
-        mock_config.YOUTUBE_TOKEN_PATH = "token.pickle"
         mock_exists.return_value = True
         
         mock_creds = Mock()
         mock_creds.valid = False
         mock_creds.expired = True
         mock_creds.refresh_token = "refresh_token"
-        mock_pickle.return_value = mock_creds
+        mock_creds.to_json.return_value = '{"token": "new"}'
+        mock_credentials.from_authorized_user_info.return_value = mock_creds
         
         # After refresh, token becomes valid
         def refresh_side_effect(request):
@@ -64,54 +71,93 @@ class TestYouTubeUploader:
         mock_service = Mock()
         mock_build.return_value = mock_service
         
-        result = self.uploader.get_authenticated_service()
+        result = uploader.get_authenticated_service()
         
         assert result == mock_service
         mock_creds.refresh.assert_called_once()
-        mock_dump.assert_called_once()
+        mock_file.assert_called_with("token.json", "w")
+        mock_file.return_value.write.assert_called_once_with('{"token": "new"}')
+    
+    @patch('os.path.exists')
+    @patch('builtins.open', new_callable=mock_open, read_data='not json')
+    @patch('pickle.load')
+    @patch('googleapiclient.discovery.build')
+    def test_get_authenticated_service_migrates_pickle_token(self, mock_build, mock_pickle, mock_file, mock_exists, mock_config, uploader):
+        """Test that a token pickled by an older version is loaded and saved as JSON."""
+        mock_config.YOUTUBE_TOKEN_PATH = "token.pickle"
+        mock_exists.return_value = True
+        
+        mock_creds = Mock()
+        mock_creds.valid = True
+        mock_creds.to_json.return_value = '{"token": "abc"}'
+        mock_pickle.return_value = mock_creds
+        
+        uploader.get_authenticated_service()
+        
+        mock_pickle.assert_called_once()
+        mock_file.assert_called_with("token.pickle", "w")
+        mock_file.return_value.write.assert_called_once_with('{"token": "abc"}')
+        mock_build.assert_called_once_with("youtube", "v3", credentials=mock_creds, static_discovery=True)
+    
+    @patch('os.path.exists')
+    @patch('builtins.open', new_callable=mock_open, read_data='{"token": "abc"}')
+    @patch('pickle.load')
+    @patch('google.oauth2.credentials.Credentials')
+    @patch('google_auth_oauthlib.flow.InstalledAppFlow')
+    @patch('googleapiclient.discovery.build')
+    def test_get_authenticated_service_incomplete_token(self, mock_build, mock_flow, mock_credentials, mock_pickle, mock_file, mock_exists, uploader):
+        """Test that JSON credentials with missing fields trigger a new sign-in instead of a pickle load."""
+        mock_exists.return_value = True
+        mock_credentials.from_authorized_user_info.side_effect = ValueError("missing refresh_token")
+        
+        mock_creds = Mock()
+        mock_creds.to_json.return_value = '{"token": "new"}'
+        mock_flow.from_client_secrets_file.return_value.run_local_server.return_value = mock_creds
+        
+        uploader.get_authenticated_service()
+        
+        mock_pickle.assert_not_called()
+        mock_flow.from_client_secrets_file.return_value.run_local_server.assert_called_once()
+        mock_file.return_value.write.assert_called_once_with('{"token": "new"}')
+        mock_build.assert_called_once_with("youtube", "v3", credentials=mock_creds, static_discovery=True)
     
-    @patch('rpicam_scraper.youtube_uploader.config')
     @patch('os.path.exists')
-    def test_get_authenticated_service_no_token(self, mock_exists, mock_config):
+    def test_get_authenticated_service_no_token(self, mock_exists, mock_config, uploader):
         """Test authentication with no existing token."""
         mock_config.YOUTUBE_TOKEN_PATH = "token.pickle"
         mock_exists.return_value = False
         
-        with patch('rpicam_scraper.youtube_uploader.InstalledAppFlow') as mock_flow:
-            with patch('rpicam_scraper.youtube_uploader.build') as mock_build:
-                with patch('builtins.open', mock_open()):
-                    with patch('pickle.dump'):
-                        mock_config.YOUTUBE_CLIENT_SECRETS = "client_secret.json"
-                        mock_config.YOUTUBE_SCOPES = ["scope1"]
-                        
-                        mock_creds = Mock()
-                        mock_flow_instance = Mock()
-                        mock_flow_instance.run_local_server.return_value = mock_creds
-                        mock_flow.from_client_secrets_file.return_value = mock_flow_instance
-                        
-                        mock_service = Mock()
-                        mock_build.return_value = mock_service
-                        
-                        result = self.uploader.get_authenticated_service()
-                        
-                        assert result == mock_service
-                        mock_flow.from_client_secrets_file.assert_called_once_with(
-                            "client_secret.json", ["scope1"]
-                        )
+        with patch('google_auth_oauthlib.flow.InstalledAppFlow') as mock_flow:
+            with patch('googleapiclient.discovery.build') as mock_build:
+                with patch('builtins.open', mock_open()) as mock_file:
+                    mock_config.YOUTUBE_CLIENT_SECRETS = "client_secret.json"
+                    mock_config.YOUTUBE_SCOPES = ["scope1"]
+                    
+                    mock_creds = Mock()
+                    mock_creds.to_json.return_value = '{"token": "abc"}'
+                    mock_flow_instance = Mock()
+                    mock_flow_instance.run_local_server.return_value = mock_creds
+                    mock_flow.from_client_secrets_file.return_value = mock_flow_instance
+                    
+                    mock_service = Mock()
+                    mock_build.return_value = mock_service
+                    
+                    result = uploader.get_authenticated_service()
+                    
+                    assert result == mock_service
+                    mock_flow.from_client_secrets_file.assert_called_once_with(
+                        "client_secret.json", ["scope1"]
+                    )
+                    mock_file.return_value.write.assert_called_once_with('{"token": "abc"}')
     
-    @patch('rpicam_scraper.youtube_uploader.config')
-    @patch('rpicam_scraper.youtube_uploader.MediaFileUpload')
-    def test_upload_video_success(self, mock_media_upload, mock_config):
+    @patch('googleapiclient.http.MediaFileUpload')
+    def test_upload_video_success(self, mock_media_upload, mock_config, uploader):
         """Test successful video upload."""
-        mock_config.YOUTUBE_UPLOAD_DESCRIPTION = "Test description"
         mock_config.youtube_tags_list = ["tag1", "tag2"]
-        mock_config.YOUTUBE_UPLOAD_CATEGORY = "22"
-        mock_config.YOUTUBE_PRIVACY_STATUS = "unlisted"
-        mock_config.MAX_RETRIES = 3
         
         # Set up mock YouTube service
         mock_service = Mock()
-        self.uploader.youtube_service = mock_service
+        uploader.youtube_service = mock_service
         
         # Mock the upload process
         mock_request = Mock()
@@ -127,24 +173,27 @@ class TestYouTubeUploader:
             (None, mock_response)  # Second call with response
         ]
         
-        result = self.uploader.upload_video("/test/video.mp4", "Test Title", "Test Description")
+        result = uploader.upload_video("/test/video.mp4", "Test Title", "Test Description")
         
         assert result is True
         mock_service.videos().insert.assert_called_once()
         call_args = mock_service.videos().insert.call_args
         assert call_args[1]['body']['snippet']['title'] == "Test Title"
         assert call_args[1]['body']['snippet']['description'] == "Test Description"
+        assert call_args[1]['body']['snippet']['tags'] == ["tag1", "tag2"]
+        mock_media_upload.assert_called_once_with(
+            "/test/video.mp4", mimetype="video/mp4", chunksize=8 * 1024 * 1024, resumable=True
+        )
     
-    @patch('rpicam_scraper.youtube_uploader.config')
-    @patch('rpicam_scraper.youtube_uploader.MediaFileUpload')
+    @patch('googleapiclient.http.MediaFileUpload')
     @patch('time.sleep')
-    def test_upload_video_rate_limit(self, mock_sleep, mock_media_upload, mock_config):
+    def test_upload_video_rate_limit(self, mock_sleep, mock_media_upload, mock_config, uploader):
         """Test video upload with rate limit error."""
         mock_config.MAX_RETRIES = 2
         
         # Set up mock YouTube service
         mock_service = Mock()
-        self.uploader.youtube_service = mock_service
+        uploader.youtube_service = mock_service
         
         # Mock rate limit error
         mock_request = Mock()
@@ -156,32 +205,49 @@ class TestYouTubeUploader:
         
         mock_request.next_chunk.side_effect = rate_limit_error
         
-        result = self.uploader.upload_video("/test/video.mp4", "Test Title")
+        result = uploader.upload_video("/test/video.mp4", "Test Title")
         
         assert result is False
         # Should sleep for 1 hour on rate limit
         mock_sleep.assert_called_with(3600)
     
-    @patch('rpicam_scraper.youtube_uploader.config')
-    @patch('rpicam_scraper.youtube_uploader.MediaFileUpload')
+    @patch('googleapiclient.http.MediaFileUpload')
     @patch('time.sleep')
-    def test_upload_video_generic_error(self, mock_sleep, mock_media_upload, mock_config):
-        """Test video upload with generic error and retries."""
-        mock_config.MAX_RETRIES = 3
+    def test_upload_video_rate_limit_callback(self, mock_sleep, mock_media_upload, uploader):
+        """Test that a rate limit is handed to on_rate_limit instead of sleeping."""
+        mock_service = Mock()
+        uploader.youtube_service = mock_service
+        uploader.on_rate_limit = Mock()
+        
+        rate_limit_error = Exception("Rate limit exceeded")
+        rate_limit_error.resp = Mock()
+        rate_limit_error.resp.status = 403
+        mock_service.videos().insert.return_value.next_chunk.side_effect = rate_limit_error
         
+        result = uploader.upload_video("/test/video.mp4", "Test Title")
+        
+        assert result is False
+        assert mock_service.videos().insert.call_count == 1
+        uploader.on_rate_limit.assert_called_once_with(3600)
+        mock_sleep.assert_not_called()
+    
+    @patch('googleapiclient.http.MediaFileUpload')
+    @patch('time.sleep')
+    def test_upload_video_generic_error(self, mock_sleep, mock_media_upload, mock_config, uploader):
+        """Test video upload with generic error and retries."""
         # Set up mock YouTube service
         mock_service = Mock()
-        self.uploader.youtube_service = mock_service
+        uploader.youtube_service = mock_service
         
         # Mock generic error
         mock_request = Mock()
         mock_service.videos().insert.return_value = mock_request
         mock_request.next_chunk.side_effect = Exception("Generic error")
         
-        result = self.uploader.upload_video("/test/video.mp4", "Test Title")
+        result = uploader.upload_video("/test/video.mp4", "Test Title")
         
         assert result is False
-        # Should have made multiple attempts
-        assert mock_service.videos().insert.call_count == 3
-        # Should have slept with exponential backoff
-        assert mock_sleep.call_count == 3
+        # Should have made one attempt per configured retry
+        assert mock_service.videos().insert.call_count == mock_config.MAX_RETRIES
+        # Should have slept with exponential backoff between attempts
+        assert mock_sleep.call_count == mock_config.MAX_RETRIES - 1